@@ -1,5 +1,8 @@
+import enum
 import os
-from dotenv import load_dotenv
+from functools import cache
+from pathlib import Path
+from typing import Final
 
 """
 Central configuration for the me.Tică+ bot.
@@ -12,60 +15,257 @@ rating constants, data locations, and replay settings.
 
 # --- Environment & secrets ----------------------------------------------------
 
-load_dotenv()
+# .env is only read on demand so importers that just need rating constants
+# (e.g. the replay analyzer) never pay for it.
+_ENV_LOADED: bool = False
 
-# Discord bot token
-TOKEN: str | None = os.getenv("DISCORD_TOKEN")
+# Discord bot token, populated by get_token(); config.TOKEN is the validated form
+_TOKEN_CACHE: str | None = None
+
+
+def _load_env(path: str = ".env") -> None:
+    """
+    Load KEY=VALUE pairs from a .env file into os.environ (once per process).
+
+    Only the trivial subset of the format this bot needs is supported:
+    comments, blank lines, and optionally quoted values. Variables that are
+    already set in the environment win over the file.
+    """
+    global _ENV_LOADED
+    if _ENV_LOADED:
+        return
+    _ENV_LOADED = True
+
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return
+    with f:
+        for line in f:
+            line = line.strip()
+            if b"=" not in line or line.startswith(b"#"):
+                continue
+            key, _, value = line.partition(b"=")
+            value = value.strip()
+            if len(value) >= 2 and value[:1] == value[-1:] and value[:1] in (b'"', b"'"):
+                value = value[1:-1]
+            os.environ.setdefault(key.strip().decode(), value.decode())
+
+
+def get_token() -> str | None:
+    """Return the Discord bot token, loading .env on first call."""
+    global _TOKEN_CACHE
+    if _TOKEN_CACHE is None:
+        _load_env()
+        _TOKEN_CACHE = os.environ.get("DISCORD_TOKEN")
+    return _TOKEN_CACHE
 
 
 # --- Rating / OpenSkill configuration ----------------------------------------
 
 # These custom values mirror your existing bot settings.
-CUSTOM_MU: float = 1200.0
-CUSTOM_SIGMA: float = 200.0 / 3.0
-CUSTOM_BETA: float = 100.0 / 3.0
-CUSTOM_TAU: float = 8.0
+CUSTOM_MU: Final[float] = 1200.0
+CUSTOM_SIGMA: Final[float] = 200.0 / 3.0
+CUSTOM_BETA: Final[float] = 100.0 / 3.0
+CUSTOM_TAU: Final[float] = 8.0
 
 
 # --- Data files ---------------------------------------------------------------
 
 # Primary persisted rating database
-DATA_FILE: str = "player_data.json"
+DATA_FILE: Final[str] = "player_data.json"
 
 # File used by /undo to restore the last match state
-BACKUP_DATA_FILE: str = "player_data_backup.json"
+BACKUP_DATA_FILE: Final[str] = "player_data_backup.json"
 
 # Test-mode data files (used when /match is run with test_mode=True)
-TEST_DATA_FILE: str = "test_player_data.json"
-TEST_BACKUP_DATA_FILE: str = "test_player_data_backup.json"
+TEST_DATA_FILE: Final[str] = "test_player_data.json"
+TEST_BACKUP_DATA_FILE: Final[str] = "test_player_data_backup.json"
+
+# Matches recorded in the undo journal before the backup snapshot is refreshed
+JOURNAL_SNAPSHOT_EVERY: Final[int] = 50
+
+# Per-player history log lines kept beside a data file before it is rewritten
+HISTORY_LOG_COMPACT_EVERY: Final[int] = 500
+
+# Current observers, saved so a restart mid-session keeps them
+OBSERVERS_FILE: Final[str] = "observers.json"
+
+
+# Files used for live (non-test) matches; rebound by set_profile()
+ACTIVE_DATA_FILE: str = DATA_FILE
+ACTIVE_BACKUP_DATA_FILE: str = BACKUP_DATA_FILE
+
+# Whether set_profile() has run; until then data_files() picks the profile
+_PROFILE_SET: bool = False
+
+
+@cache
+def data_files(test_mode: bool) -> tuple[str, str]:
+    """Return the (primary, backup) data file pair for live or test matches."""
+    if test_mode:
+        return TEST_DATA_FILE, TEST_BACKUP_DATA_FILE
+    if not _PROFILE_SET:
+        # BOT_PROFILE may be set in .env, so only resolve it once someone asks
+        _load_env()
+        set_profile(os.environ.get("BOT_PROFILE", "prod"))
+    return ACTIVE_DATA_FILE, ACTIVE_BACKUP_DATA_FILE
+
+
+def set_profile(name: str) -> None:
+    """
+    Point live matches at the "prod" (default) or "test" data files.
+
+    Unless this is called first, data_files() picks the profile from the
+    BOT_PROFILE environment variable (or .env) on first use. Call it before
+    any data is loaded (e.g. in test setup) to switch profiles, since ratings
+    keeps the live database cached in memory.
+    """
+    global ACTIVE_DATA_FILE, ACTIVE_BACKUP_DATA_FILE, _PROFILE_SET
+    if name == "prod":
+        ACTIVE_DATA_FILE, ACTIVE_BACKUP_DATA_FILE = DATA_FILE, BACKUP_DATA_FILE
+    elif name == "test":
+        ACTIVE_DATA_FILE, ACTIVE_BACKUP_DATA_FILE = TEST_DATA_FILE, TEST_BACKUP_DATA_FILE
+    else:
+        raise ValueError(f"Unknown BOT_PROFILE {name!r}; expected 'prod' or 'test'.")
+    _PROFILE_SET = True
+    data_files.cache_clear()
 
 
 # --- Replay integration -------------------------------------------------------
 
-# Default SC:BW replay folder (can be overridden via env var)
-REPLAY_FOLDER: str = os.getenv(
-    "REPLAY_FOLDER",
-    r"C:\Users\Andrei\OneDrive\Documents\StarCraft\Maps\Replays",
-)
+# Default SC:BW replay folder (can be overridden via env var / .env).
+# Use replay_folder() for the resolved Path; REPLAY_FOLDER is its str form and
+# REPLAY_FOLDER_B its bytes form (for os.scandir).
+_DEFAULT_REPLAY_FOLDER: Final[str] = r"C:\Users\Andrei\OneDrive\Documents\StarCraft\Maps\Replays"
+
+
+@cache
+def replay_folder() -> Path:
+    """Return the replay folder, expanded and resolved once per process."""
+    _load_env()
+    return Path(os.environ.get("REPLAY_FOLDER", _DEFAULT_REPLAY_FOLDER)).expanduser().resolve()
+
 
 # Maximum age (in seconds) for a replay to be considered valid for auto-upload
-AUTO_REPLAY_MAX_AGE_SECONDS: int = 15 * 60  # 15 minutes
+AUTO_REPLAY_MAX_AGE_SECONDS: Final[int] = 900  # 15 minutes
 
 # Discord's typical upload limit for non-Nitro servers (approximate)
-DISCORD_ATTACHMENT_LIMIT_MB: int = 25
+DISCORD_ATTACHMENT_LIMIT_MB: Final[int] = 25
+DISCORD_ATTACHMENT_LIMIT_BYTES: Final[int] = DISCORD_ATTACHMENT_LIMIT_MB * 1024 * 1024  # 26_214_400
 
 
 # --- Session / analytics settings --------------------------------------------
 
 # Gap that defines a new play session in /graphall and history views
-SESSION_GAP_SECONDS: int = 8 * 60 * 60  # 8 hours
+SESSION_GAP_SECONDS: Final[int] = 28800  # 8 hours
+
+# /graphall leaves out players whose last match is older than this, unless
+# include_idle is set
+GRAPHALL_IDLE_DAYS: Final[int] = 90
+
+# Observers are cleared when /match (or a restart) comes this long after the
+# last lobby
+OBSERVER_RESET_SECONDS: Final[int] = 3600  # 1 hour
+
+
+class EmbedStyle(enum.IntEnum):
+    """What to show in the embed after a match."""
+
+    HISTORY = 0
+    GRAPH = 1
+
 
-# What to show in the embed after a match. Can be "graph" or "history".
-MATCH_EMBED_STYLE: str = "history"
+# What to show in the embed after a match: EmbedStyle.HISTORY or EmbedStyle.GRAPH.
+MATCH_EMBED_STYLE: Final[EmbedStyle] = EmbedStyle.HISTORY
+
+
+@cache
+def validate_config() -> bool:
+    """
+    Sanity-check the tunable limits once at startup.
+
+    Raises RuntimeError on a bad value; later calls are free, so consumers can
+    trust these settings without re-checking them in hot paths.
+    """
+    if AUTO_REPLAY_MAX_AGE_SECONDS <= 0:
+        raise RuntimeError("AUTO_REPLAY_MAX_AGE_SECONDS must be a positive number of seconds.")
+    if SESSION_GAP_SECONDS <= 0:
+        raise RuntimeError("SESSION_GAP_SECONDS must be a positive number of seconds.")
+    if HISTORY_LOG_COMPACT_EVERY <= 0:
+        raise RuntimeError("HISTORY_LOG_COMPACT_EVERY must be a positive number of lines.")
+    if JOURNAL_SNAPSHOT_EVERY <= 0:
+        raise RuntimeError("JOURNAL_SNAPSHOT_EVERY must be a positive number of matches.")
+    if GRAPHALL_IDLE_DAYS <= 0:
+        raise RuntimeError("GRAPHALL_IDLE_DAYS must be a positive number of days.")
+    if OBSERVER_RESET_SECONDS <= 0:
+        raise RuntimeError("OBSERVER_RESET_SECONDS must be a positive number of seconds.")
+    if not 0 < DISCORD_ATTACHMENT_LIMIT_MB < 1024:
+        raise RuntimeError("DISCORD_ATTACHMENT_LIMIT_MB must be between 1 and 1023.")
+    # Resolves BOT_PROFILE now, so an unknown profile fails at startup
+    data_files(False)
+    return True
 
 
 # --- Permissions / owner config ----------------------------------------------
 
-# Replace with your actual Discord user ID; used for /dm and similar commands
-MY_DISCORD_ID: int = 351117400529436675
+# Replace with your actual Discord user ID(s); used for /dm and similar commands
+OWNER_IDS: Final[frozenset[int]] = frozenset({351117400529436675})
+
+# Deprecated single-owner alias; prefer `user_id in OWNER_IDS`
+MY_DISCORD_ID: Final[int] = next(iter(OWNER_IDS))
+
 
+# --- Lazily resolved attributes ------------------------------------------------
+
+def __getattr__(name: str):
+    # TOKEN is validated on first access so a missing secret fails fast with a
+    # clear message instead of deep inside the Discord login.
+    if name == "TOKEN":
+        token = get_token()
+        if not token:
+            raise RuntimeError(
+                "DISCORD_TOKEN is not set. Make sure it is present in your .env file."
+            )
+        return token
+    # REPLAY_FOLDER may be set in .env, so only resolve it once someone asks.
+    if name == "REPLAY_FOLDER":
+        return str(replay_folder())
+    if name == "REPLAY_FOLDER_B":
+        # bytes form so os.scandir() yields bytes names without re-decoding
+        return os.fsencode(replay_folder())
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# The lazily resolved names (TOKEN, REPLAY_FOLDER, REPLAY_FOLDER_B) only exist
+# through __getattr__, so they stay out of __all__; import them by name.
+__all__ = (
+    "get_token",
+    "CUSTOM_MU",
+    "CUSTOM_SIGMA",
+    "CUSTOM_BETA",
+    "CUSTOM_TAU",
+    "DATA_FILE",
+    "BACKUP_DATA_FILE",
+    "TEST_DATA_FILE",
+    "TEST_BACKUP_DATA_FILE",
+    "JOURNAL_SNAPSHOT_EVERY",
+    "HISTORY_LOG_COMPACT_EVERY",
+    "OBSERVERS_FILE",
+    "ACTIVE_DATA_FILE",
+    "ACTIVE_BACKUP_DATA_FILE",
+    "data_files",
+    "set_profile",
+    "replay_folder",
+    "AUTO_REPLAY_MAX_AGE_SECONDS",
+    "DISCORD_ATTACHMENT_LIMIT_MB",
+    "DISCORD_ATTACHMENT_LIMIT_BYTES",
+    "SESSION_GAP_SECONDS",
+    "GRAPHALL_IDLE_DAYS",
+    "OBSERVER_RESET_SECONDS",
+    "EmbedStyle",
+    "MATCH_EMBED_STYLE",
+    "validate_config",
+    "OWNER_IDS",
+    "MY_DISCORD_ID",
+)
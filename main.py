@@ -2,38 +2,59 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 
+import asyncio
+import bisect
 import os
 import random
-import glob
 import time
 import itertools
 import io
 import datetime
-import matplotlib.pyplot as plt
+import operator
+import matplotlib
+
+matplotlib.use("Agg")  # headless: never initialize a GUI backend
 import matplotlib.dates as mdates
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.ticker import MaxNLocator
+import numpy as np
 
 import shutil
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
 
 from config import (
     TOKEN,
-    REPLAY_FOLDER,
+    replay_folder,
+    REPLAY_FOLDER_B,
     AUTO_REPLAY_MAX_AGE_SECONDS,
     DISCORD_ATTACHMENT_LIMIT_MB,
+    DISCORD_ATTACHMENT_LIMIT_BYTES,
     SESSION_GAP_SECONDS,
-    MY_DISCORD_ID,
-    CUSTOM_MU,
-    CUSTOM_SIGMA,
-    TEST_DATA_FILE,
+    GRAPHALL_IDLE_DAYS,
+    OBSERVER_RESET_SECONDS,
+    OWNER_IDS,
+    data_files,
     MATCH_EMBED_STYLE,
+    EmbedStyle,
+    validate_config,
 )
 from ratings import (
+    BASELINE_ORDINAL,
     model,
     load_data,
     update_ratings,
     display_mmr,
-    get_player_rating,
-    backup_data,
+    get_player_ratings_bulk,
+    get_player_record,
+    get_active_player_ids,
+    get_history_arrays,
+    journal_match,
     restore_backup,
+    load_observers,
+    save_observers,
 )
 
 
@@ -89,21 +110,133 @@ bot_settings = {
     "last_lobby_time": 0.0,
 }
 
+# Held around every change to the rating database (those run in worker threads)
+# and around event-loop scans of the whole database, so the two never overlap
+_DB_LOCK = asyncio.Lock()
+
+
+# Keeps observer saves to one at a time; each snapshots the state once it holds
+# the lock, so the last save to finish always writes the latest state
+_OBSERVERS_SAVE_LOCK = asyncio.Lock()
+
+
+async def _save_observers() -> None:
+    """Persist current_observers and the last lobby time without blocking the loop."""
+    async with _OBSERVERS_SAVE_LOCK:
+        await asyncio.to_thread(
+            save_observers, list(current_observers), bot_settings["last_lobby_time"]
+        )
+
+
+def _scrims_channels(
+    guild: discord.Guild,
+) -> tuple[
+    discord.VoiceChannel | None,
+    discord.VoiceChannel | None,
+    discord.CategoryChannel | None,
+]:
+    """
+    Return the (Team Red, Team Blue, Scrims category) channels, or None for any
+    that don't exist, from a single walk over the guild's channels.
+    """
+    vc_red = vc_blue = category = None
+    for channel in guild.channels:
+        if isinstance(channel, discord.VoiceChannel):
+            if vc_red is None and channel.name == "Team Red":
+                vc_red = channel
+            elif vc_blue is None and channel.name == "Team Blue":
+                vc_blue = channel
+        elif isinstance(channel, discord.CategoryChannel):
+            if category is None and channel.name == "Scrims":
+                category = channel
+    return vc_red, vc_blue, category
+
+
+async def _retry(
+    coro_factory: Callable[[], Awaitable[Any]],
+    *,
+    max_attempts: int = 3,
+    base: float = 0.5,
+    cap: float = 8.0,
+) -> Any:
+    """
+    Await coro_factory(), retrying on 429 and 5xx responses.
+
+    Waits use exponential backoff with full jitter; a 429's Retry-After header
+    wins over the computed delay. Other HTTP errors, and the last failure, are
+    re-raised.
+    """
+    for attempt in range(max_attempts):
+        try:
+            return await coro_factory()
+        except discord.HTTPException as e:
+            if attempt == max_attempts - 1 or not (e.status == 429 or e.status >= 500):
+                raise
+            delay = random.uniform(0, min(cap, base * 2**attempt))
+            if e.status == 429:
+                retry_after = getattr(e.response, "headers", {}).get("Retry-After")
+                if retry_after is not None:
+                    delay = float(retry_after) + random.uniform(0.1, 0.5)
+            await asyncio.sleep(delay)
+
+
+async def _delete_scrims_channels(
+    vc_red: discord.VoiceChannel | None,
+    vc_blue: discord.VoiceChannel | None,
+    category: discord.CategoryChannel | None,
+) -> None:
+    """Delete the team voice channels, then the Scrims category if it's now empty."""
+    if vc_red:
+        await _retry(vc_red.delete)
+    if vc_blue:
+        await _retry(vc_blue.delete)
+    if category and len(category.channels) == 0:
+        await _retry(category.delete)
+
+
+# Voice moves are independent REST calls; cap how many run at once so a big
+# lobby doesn't trip Discord's per-route rate limit
+MOVE_CONCURRENCY = 5
+
+
+async def _move_members(moves: list[tuple[Any, discord.VoiceChannel]]) -> None:
+    """
+    Move each (member, channel) pair concurrently, at most MOVE_CONCURRENCY at once.
+
+    Members that aren't in voice (including test FakeMembers) are skipped.
+    Rate-limited and 5xx moves are retried; moves that still fail are ignored.
+    """
+    sem = asyncio.Semaphore(MOVE_CONCURRENCY)
+
+    async def move(member: Any, channel: discord.VoiceChannel) -> None:
+        async with sem:
+            try:
+                await _retry(lambda: member.move_to(channel))
+            except discord.HTTPException:
+                pass
+
+    await asyncio.gather(
+        *(
+            move(member, channel)
+            for member, channel in moves
+            if getattr(member, "voice", None) and member.voice
+        )
+    )
+
 
 class MatchView(discord.ui.View):
     def __init__(self, lobby_started: bool = False) -> None:
         super().__init__(timeout=None)
         self._lobby_started = lobby_started
+        self._btn_red = discord.utils.get(self.children, custom_id="btn_red")
+        self._btn_blue = discord.utils.get(self.children, custom_id="btn_blue")
+        self._btn_start_lobby = discord.utils.get(self.children, custom_id="btn_start_lobby")
         self._set_win_buttons_enabled(lobby_started)
 
     def _set_win_buttons_enabled(self, enabled: bool) -> None:
-        for child in self.children:
-            if getattr(child, "custom_id", None) == "btn_red":
-                child.disabled = not enabled
-            elif getattr(child, "custom_id", None) == "btn_blue":
-                child.disabled = not enabled
-            elif getattr(child, "custom_id", None) == "btn_start_lobby":
-                child.disabled = enabled
+        self._btn_red.disabled = not enabled
+        self._btn_blue.disabled = not enabled
+        self._btn_start_lobby.disabled = enabled
 
     # ▶️ START LOBBY BUTTON
     @discord.ui.button(
@@ -127,31 +260,19 @@ class MatchView(discord.ui.View):
         lobby_channel = current_match["lobby_channel"]
         guild = interaction.guild
 
-        category = discord.utils.get(guild.categories, name="Scrims")
+        vc_red, vc_blue, category = _scrims_channels(guild)
         if not category:
             category = await guild.create_category("Scrims")
 
-        vc_red = discord.utils.get(guild.voice_channels, name="Team Red") or await guild.create_voice_channel(
+        vc_red = vc_red or await guild.create_voice_channel(
             "Team Red", category=category
         )
-        vc_blue = (
-            discord.utils.get(guild.voice_channels, name="Team Blue")
-            or await guild.create_voice_channel("Team Blue", category=category)
+        vc_blue = vc_blue or await guild.create_voice_channel(
+            "Team Blue", category=category
         )
 
         # Move players to their respective team channels
-        for m in team_1:
-            if getattr(m, "voice", None) and m.voice:
-                try:
-                    await m.move_to(vc_red)
-                except discord.HTTPException:
-                    pass
-        for m in team_2:
-            if getattr(m, "voice", None) and m.voice:
-                try:
-                    await m.move_to(vc_blue)
-                except discord.HTTPException:
-                    pass
+        moves = [(m, vc_red) for m in team_1] + [(m, vc_blue) for m in team_2]
 
         # Move observers semi-randomly into the two team channels
         if lobby_channel:
@@ -160,12 +281,9 @@ class MatchView(discord.ui.View):
                 if m.id in current_observers and not m.bot
             ]
             for i, obs in enumerate(observers_in_lobby):
-                if getattr(obs, "voice", None) and obs.voice:
-                    target_vc = vc_red if i % 2 == 0 else vc_blue
-                    try:
-                        await obs.move_to(target_vc)
-                    except discord.HTTPException:
-                        pass
+                moves.append((obs, vc_red if i % 2 == 0 else vc_blue))
+
+        await _move_members(moves)
 
         self._lobby_started = True
         self._set_win_buttons_enabled(True)
@@ -228,29 +346,20 @@ class MatchView(discord.ui.View):
             all_players = current_match.get("team_1", []) + current_match.get("team_2", [])
             guild = interaction.guild
             
+            vc_red, vc_blue, category = _scrims_channels(guild)
+
             # Find any observers that might have been pulled into the team channels
-            vc_red = discord.utils.get(guild.voice_channels, name="Team Red")
-            vc_blue = discord.utils.get(guild.voice_channels, name="Team Blue")
-            observers = []
-            if vc_red:
-                observers.extend([m for m in vc_red.members if m.id in current_observers])
-            if vc_blue:
-                observers.extend([m for m in vc_blue.members if m.id in current_observers])
-                
-            for player in all_players + observers:
-                if getattr(player, "voice", None) and player.voice:
-                    try:
-                        await player.move_to(lobby)
-                    except discord.HTTPException:
-                        pass
-                        
-            category = discord.utils.get(guild.categories, name="Scrims")
-            if vc_red:
-                await vc_red.delete()
-            if vc_blue:
-                await vc_blue.delete()
-            if category and len(category.channels) == 0:
-                await category.delete()
+            observers = [
+                m
+                for vc in (vc_red, vc_blue)
+                if vc
+                for m in vc.members
+                if m.id in current_observers and m.voice
+            ]
+
+            await _move_members([(player, lobby) for player in all_players + observers])
+
+            await _delete_scrims_channels(vc_red, vc_blue, category)
 
         # Disable all buttons so they turn grey
         for child in self.children:
@@ -287,55 +396,61 @@ class MatchView(discord.ui.View):
 
 # --- ANALYTICS HELPERS --------------------------------------------------------
 
+# (lobby_matches, {pid: (by_ts, last_past_match)}) as built by _collect_session()
+SessionData = tuple[list[int], dict[str, tuple[dict[int, dict], dict | None]]]
+
+_match_timestamp = operator.itemgetter("timestamp")
+
+
+def _collect_session(data: dict, cutoff_time: float) -> SessionData:
+    """
+    Walk every player's history once for the session starting at cutoff_time.
+
+    Returns (lobby_matches, players) where lobby_matches is the sorted list of
+    this session's match timestamps and players maps each pid that played in
+    the session to (by_ts, last_past_match): their session games indexed by
+    timestamp and their last game before the session (None if they are new).
+    """
+    ts_set: set[int] = set()
+    players: dict[str, tuple[dict[int, dict], dict | None]] = {}
+
+    for pid, p_data in data.items():
+        history = p_data.get("history")
+        if not history:
+            continue
+
+        # History is append-only in match order, so the session is a suffix
+        idx = bisect.bisect_left(history, cutoff_time, key=_match_timestamp)
+        if idx == len(history):
+            continue
+
+        by_ts = {m["timestamp"]: m for m in history[idx:]}
+        ts_set.update(by_ts)
+        players[pid] = (by_ts, history[idx - 1] if idx else None)
+
+    return sorted(ts_set), players
+
+
 def generate_session_history_text(
     guild: discord.Guild,
-    data_file: str | None = None,
+    session: SessionData,
     name_overrides: dict[str, str] | None = None,
 ) -> tuple[str, str] | None:
-    data = load_data(data_file=data_file)
-    name_overrides = name_overrides or {}
-
-    cutoff_time = time.time() - SESSION_GAP_SECONDS
-
-    # 1. Grab the exact timestamps for this session's matches
-    lobby_matches = sorted(
-        list(
-            {
-                match["timestamp"]
-                for p_data in data.values()
-                if "history" in p_data
-                for match in p_data["history"]
-                if match["timestamp"] >= cutoff_time
-            }
-        )
-    )
+    """Build the (names, results) columns for the session; session comes from _collect_session()."""
+    lobby_matches, session_players = session
 
     if not lobby_matches:
         return None
 
+    names = _session_display_names(guild, session, name_overrides)
     player_data_extracted = []
 
-    for pid, p_data in data.items():
-        if "history" not in p_data:
-            continue
-
-        history = p_data["history"]
-
-        # Check if this player actually played in this session
-        played_session = any(m["timestamp"] >= cutoff_time for m in history)
-        if not played_session:
-            continue
-
-        user = guild.get_member(int(pid))
-        name = name_overrides.get(
-            pid, user.display_name if user else f"User {pid[-4:]}"
-        )
+    for pid, (by_ts, _) in session_players.items():
+        name = names[pid]
 
         match_results = []
         for lobby_ts in lobby_matches:
-            played_this_game = next(
-                (m for m in history if m["timestamp"] == lobby_ts), None
-            )
+            played_this_game = by_ts.get(lobby_ts)
             if played_this_game:
                 if played_this_game["result"] == "Win":
                     match_results.append("🟩")
@@ -362,63 +477,53 @@ def generate_session_history_text(
     return "\n".join(names_column), "\n".join(emojis_column)
 
 
-def generate_session_graph(
+def _session_display_names(
     guild: discord.Guild,
-    data_file: str | None = None,
+    session: SessionData,
     name_overrides: dict[str, str] | None = None,
-) -> discord.File | None:
-    data = load_data(data_file=data_file)
+) -> dict[str, str]:
+    """Resolve every session player's display name up front, on the event loop."""
     name_overrides = name_overrides or {}
+    get_member = guild.get_member
+    names = {}
+    for pid in session[1]:
+        # Test-mode overrides cover fake players, so skip the member lookup
+        name = name_overrides.get(pid)
+        if name is None:
+            user = get_member(int(pid))
+            name = user.display_name if user else f"User {pid[-4:]}"
+        names[pid] = name
+    return names
+
+
+def _render_session_graph(session: SessionData, names: dict[str, str]) -> bytes | None:
+    """
+    Plot everyone's MMR across the session and return it as PNG bytes.
+
+    Touches no discord.py objects, so it can run via asyncio.to_thread().
+    """
+    lobby_matches, session_players = session
+
+    if not lobby_matches or not session_players:
+        return None
 
-    plt.figure(figsize=(8, 4))
-    ax = plt.gca()
+    # Object-oriented API only: no pyplot global state, so this is thread-safe
+    fig = Figure(figsize=(8, 4))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
     ax.set_facecolor("#2b2d31")
-    plt.gcf().patch.set_facecolor("#2b2d31")
+    fig.patch.set_facecolor("#2b2d31")
     ax.tick_params(colors="lightgrey")
     for spine in ax.spines.values():
         spine.set_color("#1e1f22")
-    plt.grid(True, color="#1e1f22", linestyle="-", linewidth=1)
-
-    cutoff_time = time.time() - SESSION_GAP_SECONDS
-
-    # 1. Grab the exact timestamps for this session's matches
-    lobby_matches = sorted(
-        list(
-            {
-                match["timestamp"]
-                for p_data in data.values()
-                if "history" in p_data
-                for match in p_data["history"]
-                if match["timestamp"] >= cutoff_time
-            }
-        )
-    )
-
-    if not lobby_matches:
-        plt.close()
-        return None
-
-    lines_plotted = 0
-
-    for pid, p_data in data.items():
-        if "history" not in p_data:
-            continue
-
-        history = p_data["history"]
-
-        # Check if this player actually played in this session
-        played_session = any(m["timestamp"] >= cutoff_time for m in history)
-        if not played_session:
-            continue
+    ax.grid(True, color="#1e1f22", linestyle="-", linewidth=1)
 
+    for pid, (by_ts, last_past_match) in session_players.items():
         # Baseline MMR: last game before session, or default if new
-        past_matches = [m for m in history if m["timestamp"] < cutoff_time]
-        if past_matches:
-            baseline_mmr = int(past_matches[-1]["mmr"])
+        if last_past_match:
+            baseline_mmr = last_past_match["mmr"]
         else:
-            baseline_mmr = int(
-                model.rating(mu=CUSTOM_MU, sigma=CUSTOM_SIGMA).ordinal()
-            )
+            baseline_mmr = BASELINE_ORDINAL
 
         x_plot = [0]
         y_plot = [baseline_mmr]
@@ -426,42 +531,30 @@ def generate_session_graph(
 
         # Loop through this session's games: 1, 2, 3...
         for i, lobby_ts in enumerate(lobby_matches, start=1):
-            played_this_game = next(
-                (m for m in history if m["timestamp"] == lobby_ts), None
-            )
+            played_this_game = by_ts.get(lobby_ts)
             if played_this_game:
-                current_mmr = int(played_this_game["mmr"])
+                current_mmr = played_this_game["mmr"]
 
             x_plot.append(i)
             y_plot.append(current_mmr)
 
-        user = guild.get_member(int(pid))
-        name = name_overrides.get(
-            pid, user.display_name if user else f"User {pid[-4:]}"
-        )
-
-        plt.plot(
+        ax.plot(
             x_plot,
             y_plot,
             marker="o",
             linestyle="-",
             linewidth=2,
             markersize=5,
-            label=name,
+            label=names[pid],
         )
-        lines_plotted += 1
-
-    if lines_plotted == 0:
-        plt.close()
-        return None
 
-    plt.title("Lobby Session Progress", fontsize=12, fontweight="bold", color="white")
-    plt.xlabel("Total Lobby Matches", fontsize=10, color="lightgrey")
+    ax.set_title("Lobby Session Progress", fontsize=12, fontweight="bold", color="white")
+    ax.set_xlabel("Total Lobby Matches", fontsize=10, color="lightgrey")
 
-    ax.xaxis.set_major_locator(plt.MaxNLocator(integer=True))
-    plt.xlim(left=0)
+    ax.xaxis.set_major_locator(MaxNLocator(integer=True))
+    ax.set_xlim(left=0)
 
-    plt.legend(
+    ax.legend(
         loc="center left",
         bbox_to_anchor=(1, 0.5),
         facecolor="#2b2d31",
@@ -470,27 +563,282 @@ def generate_session_graph(
     )
 
     buf = io.BytesIO()
-    plt.savefig(buf, format="png", bbox_inches="tight")
-    buf.seek(0)
-    plt.close()
+    fig.savefig(buf, format="png", bbox_inches="tight")
+
+    return buf.getvalue()
+
+
+@dataclass(slots=True)
+class SessionView:
+    """Everything a post-match renderer needs, gathered once per match."""
+
+    guild: discord.Guild
+    session: SessionData
+    name_overrides: dict[str, str] | None = None
+
+
+async def _render_history_embed(
+    embed: discord.Embed, sv: SessionView
+) -> discord.File | None:
+    """Append the session's per-player result columns to the match embed."""
+    history_data = generate_session_history_text(
+        sv.guild,
+        sv.session,
+        name_overrides=sv.name_overrides,
+    )
+    if history_data:
+        names_col, emojis_col = history_data
+        # Add an invisible spacer to force the columns below onto a new row
+        embed.add_field(name="\u200b", value="\u200b", inline=False)
+        embed.add_field(name="Player", value=names_col, inline=True)
+        embed.add_field(name="Recent Matches", value=emojis_col, inline=True)
+    return None
+
+
+async def _render_graph_embed(
+    embed: discord.Embed, sv: SessionView
+) -> discord.File | None:
+    """Render the session graph and attach it as the match embed's image."""
+    names = _session_display_names(sv.guild, sv.session, sv.name_overrides)
+    png_bytes = await asyncio.to_thread(_render_session_graph, sv.session, names)
+    if not png_bytes:
+        return None
+    graph_file = discord.File(
+        io.BytesIO(png_bytes),
+        filename=f"session_graph_{int(time.time())}.png",
+    )
+    embed.set_image(url=f"attachment://{graph_file.filename}")
+    return graph_file
+
+
+# Post-match renderers, picked by MATCH_EMBED_STYLE. Each fills in the embed
+# and returns the file to attach with it, if any.
+_RENDERERS: dict[
+    EmbedStyle,
+    Callable[[discord.Embed, SessionView], Awaitable[discord.File | None]],
+] = {
+    EmbedStyle.HISTORY: _render_history_embed,
+    EmbedStyle.GRAPH: _render_graph_embed,
+}
+
+
+# Shared figure for /graph and /graphall: styled once here, then cleared and
+# redrawn per command under _GRAPH_LOCK instead of building a new figure.
+# Renders run in a worker thread; the lock keeps them to one at a time.
+_GRAPH_FIG = Figure(figsize=(10, 6))
+FigureCanvasAgg(_GRAPH_FIG)
+_GRAPH_AX = _GRAPH_FIG.add_subplot()
+_GRAPH_FIG.patch.set_facecolor("#2b2d31")
+_GRAPH_AX.set_facecolor("#2b2d31")
+_GRAPH_AX.tick_params(colors="lightgrey")
+for _spine in _GRAPH_AX.spines.values():
+    _spine.set_color("#1e1f22")
+_GRAPH_LOCK = asyncio.Lock()
+
+# Recent /graph PNGs, least recently used first
+GRAPH_CACHE_SIZE = 128
+_GRAPH_CACHE: OrderedDict[tuple[str, int, int, str], bytes] = OrderedDict()
+
+# Most points drawn per /graph line and per /graphall curve; longer histories
+# are downsampled, which looks the same at the rendered size
+GRAPH_MAX_POINTS = 300
+GRAPHALL_MAX_POINTS = 100
+
+
+def _downsample_lttb(
+    x: np.ndarray, y: np.ndarray, n_target: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Reduce (x, y) to n_target points with Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept; in between, each bucket keeps
+    the point forming the largest triangle with the previously kept point and
+    the next bucket's average, which preserves peaks and dips.
+    """
+    n = x.size
+    if n <= n_target or n_target < 3:
+        return x, y
+    xf = x.astype(np.float64)
+    yf = y.astype(np.float64)
+    edges = np.linspace(1, n - 1, n_target - 1).astype(np.int64)
+
+    keep = np.empty(n_target, dtype=np.int64)
+    keep[0] = 0
+    keep[-1] = n - 1
+    a = 0
+    for i in range(n_target - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (just the last point for the final bucket)
+        nxt_lo, nxt_hi = hi, edges[i + 2] if i + 2 < edges.size else n
+        avg_x = xf[nxt_lo:nxt_hi].mean()
+        avg_y = yf[nxt_lo:nxt_hi].mean()
+        area = np.abs(
+            (xf[a] - avg_x) * (yf[lo:hi] - yf[a])
+            - (xf[a] - xf[lo:hi]) * (avg_y - yf[a])
+        )
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return x[keep], y[keep]
+
+
+def _reset_graph_axes():
+    """Clear the shared graph axes, keeping their dark styling."""
+    _GRAPH_AX.cla()
+    # cla() keeps colors and spines but switches the grid back off
+    _GRAPH_AX.grid(True, color="#1e1f22", linestyle="-", linewidth=1)
+    return _GRAPH_AX
+
+
+def _render_graph(mmr: np.ndarray, display_name: str) -> bytes:
+    """
+    Plot one player's MMR after every match (as returned by
+    get_history_arrays()) and return it as PNG bytes.
+
+    Draws on the shared figure, so callers must hold _GRAPH_LOCK; touches no
+    discord.py objects, so it can run via asyncio.to_thread().
+    """
+    ax = _reset_graph_axes()
+
+    y_mmr = np.concatenate(([BASELINE_ORDINAL], mmr))
+    x_matches = np.arange(mmr.size + 1)
+    x_matches, y_mmr = _downsample_lttb(x_matches, y_mmr, GRAPH_MAX_POINTS)
+
+    ax.plot(
+        x_matches,
+        y_mmr,
+        marker="o",
+        linestyle="-",
+        color="dodgerblue",
+        linewidth=2,
+        markersize=6,
+    )
+    ax.set_title(
+        f"MMR History for {display_name}",
+        fontsize=14,
+        fontweight="bold",
+        color="white",
+    )
+    ax.set_xlabel("Matches Played", fontsize=12, color="lightgrey")
+    ax.set_ylabel("MMR (Integer Rating)", fontsize=12, color="lightgrey")
+
+    buf = io.BytesIO()
+    _GRAPH_FIG.savefig(buf, format="png", bbox_inches="tight")
+    return buf.getvalue()
+
+
+def _render_graphall(players: list[tuple[str, np.ndarray, np.ndarray]]) -> bytes:
+    """
+    Plot every (name, timestamps, mmr) player's MMR at the end of each play
+    session and return it as PNG bytes. Same locking and threading rules as
+    _render_graph().
+    """
+    ax = _reset_graph_axes()
+
+    for name, ts, mmr in players:
+        # A session ends wherever the gap to the next game exceeds
+        # SESSION_GAP_SECONDS, and at the player's latest game
+        session_ends = np.append(np.flatnonzero(np.diff(ts) > SESSION_GAP_SECONDS), ts.size - 1)
+        if session_ends.size > GRAPHALL_MAX_POINTS:
+            # Every stride-th session, always ending on the latest one
+            stride = -(-session_ends.size // GRAPHALL_MAX_POINTS)
+            session_ends = session_ends[::-1][::stride][::-1]
+
+        x_times = [datetime.datetime.fromtimestamp(t) for t in ts[session_ends].tolist()]
+        y_mmr = mmr[session_ends].tolist()
+
+        x_times.append(datetime.datetime.now())
+        y_mmr.append(y_mmr[-1])
+
+        ax.plot(
+            x_times,
+            y_mmr,
+            marker="o",
+            linestyle="-",
+            linewidth=2,
+            markersize=5,
+            label=name,
+        )
+
+    ax.set_title(
+        "📈 MMR Session Aggregated",
+        fontsize=14,
+        fontweight="bold",
+        color="white",
+    )
+    ax.set_xlabel("Date", fontsize=12, color="lightgrey")
+    ax.set_ylabel("MMR (Integer Rating)", fontsize=12, color="lightgrey")
+
+    ax.xaxis.set_major_formatter(mdates.DateFormatter("%b %d"))
+    for label in ax.get_xticklabels():
+        label.set_rotation(45)
+    ax.legend(
+        loc="best",
+        facecolor="#2b2d31",
+        edgecolor="#1e1f22",
+        labelcolor="lightgrey",
+    )
 
-    unique_filename = f"session_graph_{int(time.time())}.png"
-    return discord.File(buf, filename=unique_filename)
+    buf = io.BytesIO()
+    _GRAPH_FIG.savefig(buf, format="png", bbox_inches="tight")
+    return buf.getvalue()
 
 
 # --- BOT EVENTS ---------------------------------------------------------------
 
+# Observer role per guild id, so /obs doesn't rescan guild.roles every time
+_obs_role_cache: dict[int, discord.Role] = {}
+
+
+async def _get_obs_role(guild: discord.Guild, create: bool = True) -> discord.Role | None:
+    """
+    Return the guild's Observer role, creating it if missing and create is set.
+
+    Returns None if the role doesn't exist and can't (or shouldn't) be created.
+    """
+    obs_role = _obs_role_cache.get(guild.id)
+    if obs_role is not None:
+        return obs_role
+    obs_role = discord.utils.get(guild.roles, name="Observer")
+    if not obs_role and create:
+        try:
+            obs_role = await guild.create_role(name="Observer", reason="Created by bot for observer tracking")
+        except discord.Forbidden:
+            pass
+    if obs_role:
+        _obs_role_cache[guild.id] = obs_role
+    return obs_role
+
+
+@bot.event
+async def on_guild_role_delete(role: discord.Role):
+    if _obs_role_cache.get(role.guild.id) == role:
+        del _obs_role_cache[role.guild.id]
+
+
+@bot.event
+async def on_guild_role_update(before: discord.Role, after: discord.Role):
+    # A renamed role stops being the Observer role
+    if _obs_role_cache.get(after.guild.id) == after and after.name != "Observer":
+        del _obs_role_cache[after.guild.id]
+
+
 async def clear_all_observers() -> None:
     """Clears the active observers list and removes the Observer role from everyone."""
     current_observers.clear()
+
+    async def remove_role(member: discord.Member, role: discord.Role) -> None:
+        try:
+            await member.remove_roles(role)
+        except discord.Forbidden:
+            pass
+
+    tasks = []
     for guild in bot.guilds:
-        obs_role = discord.utils.get(guild.roles, name="Observer")
-        for member in guild.members:
-            if obs_role and obs_role in member.roles:
-                try:
-                    await member.remove_roles(obs_role)
-                except discord.Forbidden:
-                    pass
+        obs_role = await _get_obs_role(guild, create=False)
+        if obs_role:
+            # role.members is the cached holder list, no need to scan every member
+            tasks.extend(remove_role(member, obs_role) for member in obs_role.members)
+    await asyncio.gather(*tasks)
 
 @bot.event
 async def on_ready():
@@ -506,8 +854,15 @@ async def on_ready():
     except Exception as e:
         print(f"Failed to sync commands: {e}")
 
-    # Ensure no one is stuck as an observer if the bot crashed/restarted
-    await clear_all_observers()
+    # Pick observers back up after a restart mid-session; otherwise make sure
+    # no one is stuck as an observer from an old one
+    saved_observers, last_lobby_time = await asyncio.to_thread(load_observers)
+    if time.time() - last_lobby_time > OBSERVER_RESET_SECONDS:
+        await clear_all_observers()
+        await _save_observers()
+    else:
+        current_observers.update(saved_observers)
+        bot_settings["last_lobby_time"] = last_lobby_time
 
     print(f"Logged in as {bot.user.name}")
 
@@ -515,6 +870,54 @@ async def on_ready():
 # --- MATCH RESOLUTION ---------------------------------------------------------
 
 
+def _find_latest_replay(folder: bytes) -> tuple[os.DirEntry, os.stat_result] | None:
+    """
+    Return (entry, stat) for the newest .rep file in folder, or None if there is none.
+
+    A single os.scandir() pass; each entry is stat'ed once. Raises OSError if
+    the folder is missing. Blocking, so call it via asyncio.to_thread().
+    """
+    latest = None
+    with os.scandir(folder) as it:
+        for e in it:
+            if not e.name.endswith(b".rep") or not e.is_file():
+                continue
+            st = e.stat()
+            if latest is None or st.st_mtime > latest[1].st_mtime:
+                latest = (e, st)
+    return latest
+
+
+def _apply_match_result(
+    winners: list, losers: list, data_file: str
+) -> tuple[dict, dict[int, float], dict[int, float]]:
+    """
+    Journal the match for /undo, rate it, and return
+    (updated data, MMR before, MMR after) keyed by player ID.
+    """
+    # --- 🛡️ SAVE STATE BACKUP ---
+    match_time = int(time.time())
+    journal_match(winners, losers, match_time, data_file=data_file)
+
+    # 📸 SNAPSHOT: Grab everyone's MMR BEFORE the math happens
+    match_ids = [p.id for p in winners + losers]
+    data = load_data(data_file=data_file)
+    old_mmrs = {
+        pid: r.ordinal()
+        for pid, r in get_player_ratings_bulk(match_ids, data=data).items()
+    }
+
+    # Run the OpenSkill math and save to database; data is updated in place
+    update_ratings(
+        winners, losers, data_file=data_file, match_time=match_time, data=data
+    )
+    new_mmrs = {
+        pid: r.ordinal()
+        for pid, r in get_player_ratings_bulk(match_ids, data=data).items()
+    }
+    return data, old_mmrs, new_mmrs
+
+
 async def handle_victory_slash(
     interaction: discord.Interaction, team_name: str
 ) -> None:
@@ -535,30 +938,25 @@ async def handle_victory_slash(
         return
 
     test_mode = current_match.get("test_mode", False)
-    data_file = TEST_DATA_FILE if test_mode else None
-
-    # --- 🛡️ SAVE STATE BACKUP ---
-    backup_data(data_file=data_file)
+    data_file, _ = data_files(test_mode)
 
-    # 📸 SNAPSHOT: Grab everyone's MMR BEFORE the math happens
-    old_mmrs = {
-        p.id: get_player_rating(p.id, data_file=data_file).ordinal()
-        for p in winners + losers
-    }
-
-    # Run the OpenSkill math and save to database
-    update_ratings(winners, losers, data_file=data_file)
+    # Disk I/O and rating math run off the event loop so the gateway stays live
+    async with _DB_LOCK:
+        data, old_mmrs, new_mmrs = await asyncio.to_thread(
+            _apply_match_result, winners, losers, data_file
+        )
+        session = _collect_session(data, time.time() - SESSION_GAP_SECONDS)
 
     # Build winner / loser lines
     win_strings = []
     for p in winners:
-        new_mmr = get_player_rating(p.id, data_file=data_file).ordinal()
+        new_mmr = new_mmrs[p.id]
         diff = int(new_mmr - old_mmrs[p.id])
         win_strings.append(f"{p.display_name}: **{int(new_mmr)}** (🟩 +{diff})")
 
     lose_strings = []
     for p in losers:
-        new_mmr = get_player_rating(p.id, data_file=data_file).ordinal()
+        new_mmr = new_mmrs[p.id]
         diff = int(new_mmr - old_mmrs[p.id])
         lose_strings.append(f"{p.display_name}: **{int(new_mmr)}** (🟥 {diff})")
 
@@ -573,36 +971,23 @@ async def handle_victory_slash(
     lobby = current_match["lobby_channel"]
     all_players = team_red + team_blue
 
+    guild = interaction.guild
+    vc_red, vc_blue, category = _scrims_channels(guild)
+
     if lobby:
         # Find any observers that might have been pulled into the team channels
-        guild = interaction.guild
-        vc_red = discord.utils.get(guild.voice_channels, name="Team Red")
-        vc_blue = discord.utils.get(guild.voice_channels, name="Team Blue")
-        observers = []
-        if vc_red:
-            observers.extend([m for m in vc_red.members if m.id in current_observers])
-        if vc_blue:
-            observers.extend([m for m in vc_blue.members if m.id in current_observers])
-            
-        for player in all_players + observers:
-            if getattr(player, "voice", None) and player.voice:
-                try:
-                    await player.move_to(lobby)
-                except discord.HTTPException:
-                    pass
+        observers = [
+            m
+            for vc in (vc_red, vc_blue)
+            if vc
+            for m in vc.members
+            if m.id in current_observers and m.voice
+        ]
 
-    # Delete channels
-    guild = interaction.guild
-    vc_red = discord.utils.get(guild.voice_channels, name="Team Red")
-    vc_blue = discord.utils.get(guild.voice_channels, name="Team Blue")
-    category = discord.utils.get(guild.categories, name="Scrims")
+        await _move_members([(player, lobby) for player in all_players + observers])
 
-    if vc_red:
-        await vc_red.delete()
-    if vc_blue:
-        await vc_blue.delete()
-    if category and len(category.channels) == 0:
-        await category.delete()
+    # Delete channels
+    await _delete_scrims_channels(vc_red, vc_blue, category)
 
     # Reset state
     test_mode = current_match.get("test_mode", False)
@@ -618,31 +1003,17 @@ async def handle_victory_slash(
         name_overrides = {
             str(p.id): p.display_name for p in team_red + team_blue
         }
-        
-    if MATCH_EMBED_STYLE == "history":
-        history_data = generate_session_history_text(
-            guild,
-            data_file=TEST_DATA_FILE if test_mode else None,
-            name_overrides=name_overrides,
-        )
-        if history_data:
-            names_col, emojis_col = history_data
-            # Add an invisible spacer to force the columns below onto a new row
-            embed.add_field(name="\u200b", value="\u200b", inline=False)
-            embed.add_field(name="Player", value=names_col, inline=True)
-            embed.add_field(name="Recent Matches", value=emojis_col, inline=True)
-        await interaction.followup.send(embed=embed)
+
+    sv = SessionView(
+        guild=guild,
+        session=session,
+        name_overrides=name_overrides,
+    )
+    session_file = await _RENDERERS[MATCH_EMBED_STYLE](embed, sv)
+    if session_file:
+        await interaction.followup.send(embed=embed, file=session_file)
     else:
-        graph_file = generate_session_graph(
-            guild,
-            data_file=TEST_DATA_FILE if test_mode else None,
-            name_overrides=name_overrides,
-        )
-        if graph_file:
-            embed.set_image(url=f"attachment://{graph_file.filename}")
-            await interaction.followup.send(embed=embed, file=graph_file)
-        else:
-            await interaction.followup.send(embed=embed)
+        await interaction.followup.send(embed=embed)
 
     # --- 📼 AUTO-REPLAY INTEGRATION (skip in test mode) ---
     if not test_mode and bot_settings.get("auto_replay"):
@@ -657,23 +1028,24 @@ async def handle_victory_slash(
             "⏳ *Attempting to auto-grab the latest replay...*"
         )
 
-        if not REPLAY_FOLDER or not os.path.exists(REPLAY_FOLDER):
+        try:
+            latest = await asyncio.to_thread(_find_latest_replay, REPLAY_FOLDER_B)
+        except OSError:
             await status_msg.edit(
-                content=f"❌ Could not find the folder: `{REPLAY_FOLDER}`. Check your path!"
+                content=f"❌ Could not find the folder: `{replay_folder()}`. Check your path!"
             )
             return
 
-        list_of_files = glob.glob(f"{REPLAY_FOLDER}/*")
-        if not list_of_files:
+        if latest is None:
             await status_msg.edit(
-                content="❌ The replay folder is completely empty!"
+                content="❌ The replay folder has no `.rep` files!"
             )
             return
 
-        latest_file = max(list_of_files, key=os.path.getmtime)
-        file_name = os.path.basename(latest_file)
+        latest_file, latest_stat = latest
+        file_name = os.fsdecode(latest_file.name)
 
-        file_age_seconds = time.time() - os.path.getmtime(latest_file)
+        file_age_seconds = time.time() - latest_stat.st_mtime
         file_max_age_seconds = AUTO_REPLAY_MAX_AGE_SECONDS
 
         if file_age_seconds > file_max_age_seconds:
@@ -687,8 +1059,8 @@ async def handle_victory_slash(
             )
             return
 
-        file_size_mb = os.path.getsize(latest_file) / (1024 * 1024)
-        if file_size_mb > DISCORD_ATTACHMENT_LIMIT_MB:
+        if latest_stat.st_size > DISCORD_ATTACHMENT_LIMIT_BYTES:
+            file_size_mb = latest_stat.st_size / (1024 * 1024)
             await status_msg.edit(
                 content=(
                     f"❌ The newest replay (`{file_name}`) is **{file_size_mb:.1f}MB**, "
@@ -699,13 +1071,13 @@ async def handle_victory_slash(
 
         t1_names = (
             "\n".join(
-                f"{m.display_name} ({display_mmr(m.id)})" for m in team_red
+                f"{m.display_name} ({display_mmr(m.id, data=data)})" for m in team_red
             )
             or "None"
         )
         t2_names = (
             "\n".join(
-                f"{m.display_name} ({display_mmr(m.id)})" for m in team_blue
+                f"{m.display_name} ({display_mmr(m.id, data=data)})" for m in team_blue
             )
             or "None"
         )
@@ -722,8 +1094,11 @@ async def handle_victory_slash(
         embed_replay.add_field(name="🔵 Team Blue", value=t2_names, inline=True)
 
         try:
-            discord_file = discord.File(latest_file)
-            await replay_channel.send(embed=embed_replay, file=discord_file)
+            # Open off the event loop; aiohttp then streams the upload from the handle
+            replay_fh = await asyncio.to_thread(open, latest_file.path, "rb")
+            with replay_fh:
+                discord_file = discord.File(replay_fh, filename=file_name)
+                await replay_channel.send(embed=embed_replay, file=discord_file)
             await status_msg.delete()
             # Fixed: use interaction.followup instead of undefined ctx
             await interaction.followup.send(
@@ -738,44 +1113,50 @@ async def handle_victory_slash(
 # --- COMMANDS -----------------------------------------------------------------
 
 
+async def _followup_ephemeral(interaction: discord.Interaction, content: str) -> None:
+    """
+    Send an ephemeral reply after a public defer().
+
+    The first followup would otherwise replace the public "thinking" message,
+    so drop that placeholder first.
+    """
+    await interaction.delete_original_response()
+    await interaction.followup.send(content, ephemeral=True)
+
+
+# Ladder rank badges; everyone below the podium gets "-N- "
+_MEDALS = {1: "🥇", 2: "🥈", 3: "🥉"}
+
+
 @bot.tree.command(
     name="ladder", description="🏆 View the server's MMR standings 🏆"
 )
 async def ladder(interaction: discord.Interaction):
-    data = load_data()
+    await interaction.response.defer()
 
     active_players = []
-    for pid, p_data in data.items():
-        if "history" in p_data and len(p_data["history"]) > 0:
-            current_mmr = int(p_data["history"][-1]["mmr"])
-            active_players.append((pid, current_mmr))
+    async with _DB_LOCK:
+        data = load_data()
+        for pid, p_data in data.items():
+            if "history" in p_data and len(p_data["history"]) > 0:
+                current_mmr = p_data.get("current_mmr", p_data["history"][-1]["mmr"])
+                active_players.append((pid, current_mmr))
 
     if not active_players:
-        await interaction.response.send_message(
-            "❌ No matches have been played yet!", ephemeral=True
-        )
+        await _followup_ephemeral(interaction, "❌ No matches have been played yet!")
         return
 
     active_players.sort(key=lambda x: x[1], reverse=True)
 
-    players_column = "\u200b\n"
-    mmr_column = "\u200b\n"
-
-    for rank, (pid, mmr) in enumerate(active_players, 1):
-        user = interaction.guild.get_member(int(pid))
+    get_member = interaction.guild.get_member
+    player_rows = []
+    for rank, (pid, _) in enumerate(active_players, 1):
+        user = get_member(int(pid))
         name = user.display_name if user else f"User {pid[-4:]}"
+        player_rows.append(f"{_MEDALS.get(rank, f'-{rank}- ')} **{name}**\n\n")
 
-        if rank == 1:
-            medal = "🥇"
-        elif rank == 2:
-            medal = "🥈"
-        elif rank == 3:
-            medal = "🥉"
-        else:
-            medal = f"-{rank}- "
-
-        players_column += f"{medal} **{name}**\n\n"
-        mmr_column += f"**{mmr}** MMR\n\n"
+    players_column = "\u200b\n" + "".join(player_rows)
+    mmr_column = "\u200b\n" + "".join(f"**{mmr}** MMR\n\n" for _, mmr in active_players)
 
     embed = discord.Embed(
         title="🏆 LADDER STANDINGS 🏆",
@@ -786,7 +1167,7 @@ async def ladder(interaction: discord.Interaction):
     embed.add_field(name="Player", value=players_column, inline=True)
     embed.add_field(name="Rating", value=mmr_column, inline=True)
 
-    await interaction.response.send_message(embed=embed)
+    await interaction.followup.send(embed=embed)
 
 
 async def _run_match_lobby(
@@ -797,36 +1178,38 @@ async def _run_match_lobby(
     balanced: bool,
 ) -> None:
     """Shared logic: build teams, store state, create channels, move players, send embed + view."""
-    data_file_for_match = TEST_DATA_FILE if test_mode else None
+    data_file_for_match, _ = data_files(test_mode)
+
+    # One database read feeds the team search, the odds, and the roster embed
+    player_ratings = get_player_ratings_bulk(
+        [p.id for p in players], data_file=data_file_for_match
+    )
 
     if balanced:
         match_type_title = "⚖️ Balanced Match Started!"
-        best_diff = 1.0
-        best_t1, best_t2 = [], []
-        best_prob = 0.5
         team_size = len(players) // 2
-
-        for t1_combo in itertools.combinations(players, team_size):
-            t1 = list(t1_combo)
-            t2 = [p for p in players if p not in t1]
-
-            t1_ratings = [
-                get_player_rating(p.id, data_file=data_file_for_match) for p in t1
-            ]
-            t2_ratings = [
-                get_player_rating(p.id, data_file=data_file_for_match) for p in t2
+        n = len(players)
+
+        # predict_win is monotonic in |mu_t1 - mu_t2| here: its spread term uses
+        # the summed variance of every player, which is the same for each split.
+        # So the fairest split is the one whose Team 1 mu sum is closest to half.
+        mus = np.array([player_ratings[p.id].mu for p in players])
+        splits = np.array(list(itertools.combinations(range(n), team_size)))
+        mask = np.zeros((len(splits), n), dtype=bool)
+        mask[np.arange(len(splits))[:, None], splits] = True
+        best = int(np.argmin(np.abs(2.0 * (mask @ mus) - mus.sum())))
+
+        best_t1_idx = splits[best].tolist()
+        best_t2_idx = np.flatnonzero(~mask[best]).tolist()
+        best_prob = model.predict_win(
+            [
+                [player_ratings[players[i].id] for i in best_t1_idx],
+                [player_ratings[players[i].id] for i in best_t2_idx],
             ]
+        )[0]
 
-            prob = model.predict_win([t1_ratings, t2_ratings])[0]
-            diff = abs(prob - 0.5)
-
-            if diff < best_diff:
-                best_diff = diff
-                best_t1 = t1
-                best_t2 = t2
-                best_prob = prob
-
-        team_1, team_2 = best_t1, best_t2
+        team_1 = [players[i] for i in best_t1_idx]
+        team_2 = [players[i] for i in best_t2_idx]
         win_percentage = round(best_prob * 100, 1)
     else:
         match_type_title = "🎲 Random Match Started!"
@@ -835,12 +1218,8 @@ async def _run_match_lobby(
         team_1 = players[:mid]
         team_2 = players[mid:]
 
-        t1_ratings = [
-            get_player_rating(p.id, data_file=data_file_for_match) for p in team_1
-        ]
-        t2_ratings = [
-            get_player_rating(p.id, data_file=data_file_for_match) for p in team_2
-        ]
+        t1_ratings = [player_ratings[p.id] for p in team_1]
+        t2_ratings = [player_ratings[p.id] for p in team_2]
         win_chance = model.predict_win([t1_ratings, t2_ratings])[0]
         win_percentage = round(win_chance * 100, 1)
 
@@ -856,7 +1235,7 @@ async def _run_match_lobby(
         "Then use Red Wins / Blue Wins to report the result."
     )
     if test_mode:
-        desc += f"\n\n🧪 **Test:** MMR updates go to {TEST_DATA_FILE}."
+        desc += f"\n\n🧪 **Test:** MMR updates go to {data_file_for_match}."
 
     embed = discord.Embed(
         title=match_type_title,
@@ -865,11 +1244,11 @@ async def _run_match_lobby(
     )
 
     t1_names = "\n".join(
-        f"**{p.display_name}** ({int(get_player_rating(p.id, data_file=data_file_for_match).ordinal())})"
+        f"**{p.display_name}** ({int(player_ratings[p.id].ordinal())})"
         for p in team_1
     )
     t2_names = "\n".join(
-        f"**{p.display_name}** ({int(get_player_rating(p.id, data_file=data_file_for_match).ordinal())})"
+        f"**{p.display_name}** ({int(player_ratings[p.id].ordinal())})"
         for p in team_2
     )
 
@@ -915,10 +1294,14 @@ async def match(interaction: discord.Interaction, balanced: bool = False):
 
     # If it's been over an hour since the last match started, clear all observers first
     current_time = time.time()
-    if current_time - bot_settings["last_lobby_time"] > 3600:
+    cleared = current_time - bot_settings["last_lobby_time"] > OBSERVER_RESET_SECONDS
+    if cleared:
         await clear_all_observers()
         
     bot_settings["last_lobby_time"] = current_time
+    # The saved lobby time only matters while someone is observing
+    if cleared or current_observers:
+        await _save_observers()
 
     if current_match["active"]:
         await interaction.followup.send(
@@ -959,42 +1342,31 @@ async def obs(interaction: discord.Interaction):
     if not isinstance(member, discord.Member) or not interaction.guild:
         await interaction.response.send_message("❌ This command must be used in a server.", ephemeral=True)
         return
-        
-    obs_role = discord.utils.get(interaction.guild.roles, name="Observer")
-    if not obs_role:
+    await interaction.response.defer()
+
+    obs_role = await _get_obs_role(interaction.guild)
+    observing = member.id not in current_observers
+
+    if observing:
+        current_observers.add(member.id)
+        message = f"👁️ **{member.display_name}** is observing 👁️\n*(They will be excluded from matchmaking)*"
+    else:
+        current_observers.discard(member.id)
+        message = f"⚔️ **{member.display_name}** is no longer observing ⚔️\n*(They will be included in matches)*"
+
+    await _save_observers()
+
+    # Discord ignores adding a role the member already has (and removing one they don't)
+    if obs_role:
         try:
-            obs_role = await interaction.guild.create_role(name="Observer", reason="Created by bot for observer tracking")
+            if observing:
+                await member.add_roles(obs_role, reason="/obs on")
+            else:
+                await member.remove_roles(obs_role, reason="/obs off")
         except discord.Forbidden:
             pass
-    
-    if member.id in current_observers:
-        # User is observing, turn it OFF
-        current_observers.discard(member.id)
-        
-        # Remove the Observer role
-        if obs_role and obs_role in member.roles:
-            try:
-                await member.remove_roles(obs_role)
-            except discord.Forbidden:
-                pass
-                
-        await interaction.response.send_message(
-            f"⚔️ **{member.display_name}** is no longer observing ⚔️\n*(They will be included in matches)*"
-        )
-    else:
-        # User is playing, turn it ON
-        current_observers.add(member.id)
-        
-        # Add the Observer role
-        if obs_role:
-            try:
-                await member.add_roles(obs_role)
-            except discord.Forbidden:
-                pass
-                
-        await interaction.response.send_message(
-            f"👁️ **{member.display_name}** is observing 👁️\n*(They will be excluded from matchmaking)*"
-        )
+
+    await interaction.followup.send(message)
 
 
 @bot.tree.command(
@@ -1042,23 +1414,21 @@ async def test(interaction: discord.Interaction):
 async def stats(
     interaction: discord.Interaction, member: discord.Member | None = None
 ):
+    await interaction.response.defer(ephemeral=True)
     member = member or interaction.user
 
     data = load_data()
     pid = str(member.id)
 
     if pid not in data or "history" not in data[pid] or len(data[pid]["history"]) == 0:
-        await interaction.response.send_message(
+        await interaction.followup.send(
             f"❌ **{member.display_name}** hasn't played any matches yet!",
             ephemeral=True,
         )
         return
 
     history = data[pid]["history"]
-    current_mmr = int(history[-1]["mmr"])
-
-    wins = sum(1 for match in history if match["result"] == "Win")
-    losses = len(history) - wins
+    wins, losses, current_mmr = get_player_record(data[pid])
     win_rate = round((wins / len(history)) * 100, 1)
 
     embed = discord.Embed(
@@ -1078,7 +1448,7 @@ async def stats(
     if member.avatar:
         embed.set_thumbnail(url=member.avatar.url)
 
-    await interaction.response.send_message(embed=embed, ephemeral=True)
+    await interaction.followup.send(embed=embed, ephemeral=True)
 
 
 @bot.command()
@@ -1124,45 +1494,23 @@ async def graph(
         )
         return
 
-    plt.figure(figsize=(10, 6))
-    ax = plt.gca()
-    ax.set_facecolor("#2b2d31")
-    plt.gcf().patch.set_facecolor("#2b2d31")
-    ax.tick_params(colors="lightgrey")
-    for spine in ax.spines.values():
-        spine.set_color("#1e1f22")
-    plt.grid(True, color="#1e1f22", linestyle="-", linewidth=1)
-
-    history = data[pid]["history"]
-
-    baseline_mmr = int(model.rating(mu=CUSTOM_MU, sigma=CUSTOM_SIGMA).ordinal())
-    y_mmr = [baseline_mmr] + [int(entry["mmr"]) for entry in history]
-    x_matches = list(range(0, len(history) + 1))
-
-    plt.plot(
-        x_matches,
-        y_mmr,
-        marker="o",
-        linestyle="-",
-        color="dodgerblue",
-        linewidth=2,
-        markersize=6,
-    )
-    plt.title(
-        f"MMR History for {member.display_name}",
-        fontsize=14,
-        fontweight="bold",
-        color="white",
-    )
-    plt.xlabel("Matches Played", fontsize=12, color="lightgrey")
-    plt.ylabel("MMR (Integer Rating)", fontsize=12, color="lightgrey")
-
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png", bbox_inches="tight")
-    buf.seek(0)
-    plt.close()
+    # The graph only changes when the player finishes (or undoes) a match; the
+    # key comes from the same arrays that get drawn, so the two always agree
+    ts, mmr, _ = get_history_arrays(pid)
+    cache_key = (pid, ts.size, int(ts[-1]), member.display_name)
+    png_bytes = _GRAPH_CACHE.get(cache_key)
+    if png_bytes is None:
+        async with _GRAPH_LOCK:
+            png_bytes = await asyncio.to_thread(
+                _render_graph, mmr, member.display_name
+            )
+        _GRAPH_CACHE[cache_key] = png_bytes
+        if len(_GRAPH_CACHE) > GRAPH_CACHE_SIZE:
+            _GRAPH_CACHE.popitem(last=False)
+    else:
+        _GRAPH_CACHE.move_to_end(cache_key)
 
-    file = discord.File(buf, filename="graph.png")
+    file = discord.File(io.BytesIO(png_bytes), filename="graph.png")
     embed = discord.Embed(
         title=f"📈 {member.display_name}'s MMR Progress",
         color=discord.Color.blue(),
@@ -1176,90 +1524,42 @@ async def graph(
     name="graphall",
     description="🌍 Graph the entire server's MMR progression by session.",
 )
-async def graphall(interaction: discord.Interaction):
+@app_commands.describe(
+    include_idle=f"Also graph players who haven't played in {GRAPHALL_IDLE_DAYS} days"
+)
+async def graphall(interaction: discord.Interaction, include_idle: bool = False):
     await interaction.response.defer()
 
-    data = load_data()
+    active_ids = get_active_player_ids()
 
-    plt.figure(figsize=(10, 6))
-    ax = plt.gca()
-    ax.set_facecolor("#2b2d31")
-    plt.gcf().patch.set_facecolor("#2b2d31")
-    ax.tick_params(colors="lightgrey")
-    for spine in ax.spines.values():
-        spine.set_color("#1e1f22")
-    plt.grid(True, color="#1e1f22", linestyle="-", linewidth=1)
+    if not active_ids:
+        await interaction.followup.send("❌ No matches have been played yet!")
+        return
 
-    lines_plotted = 0
+    idle_cutoff = 0 if include_idle else time.time() - GRAPHALL_IDLE_DAYS * 86400
 
-    for pid, p_data in data.items():
-        if "history" not in p_data or len(p_data["history"]) == 0:
+    # Names need the guild, so resolve them here before handing off to the thread
+    get_member = interaction.guild.get_member
+    players = []
+    for pid in active_ids:
+        ts, mmr, _ = get_history_arrays(pid)
+        if ts[-1] < idle_cutoff:
             continue
-
-        history = p_data["history"]
-
-        session_data = []
-        current_time = history[0]["timestamp"]
-        current_mmr = int(history[0]["mmr"])
-
-        for entry in history[1:]:
-            if entry["timestamp"] - current_time > SESSION_GAP_SECONDS:
-                session_data.append({"time": current_time, "mmr": current_mmr})
-
-            current_time = entry["timestamp"]
-            current_mmr = int(entry["mmr"])
-
-        session_data.append({"time": current_time, "mmr": current_mmr})
-
-        x_times = [datetime.datetime.fromtimestamp(s["time"]) for s in session_data]
-        y_mmr = [s["mmr"] for s in session_data]
-
-        x_times.append(datetime.datetime.now())
-        y_mmr.append(y_mmr[-1])
-
-        user = interaction.guild.get_member(int(pid))
+        user = get_member(int(pid))
         name = user.display_name if user else f"User {pid[-4:]}"
+        players.append((name, ts, mmr))
 
-        plt.plot(
-            x_times,
-            y_mmr,
-            marker="o",
-            linestyle="-",
-            linewidth=2,
-            markersize=5,
-            label=name,
+    if not players:
+        await interaction.followup.send(
+            f"❌ Nobody has played in the last {GRAPHALL_IDLE_DAYS} days! "
+            "Use `include_idle` to graph everyone."
         )
-        lines_plotted += 1
-
-    if lines_plotted == 0:
-        await interaction.followup.send("❌ No matches have been played yet!")
-        plt.close()
         return
 
-    plt.title(
-        "📈 MMR Session Aggregated",
-        fontsize=14,
-        fontweight="bold",
-        color="white",
-    )
-    plt.xlabel("Date", fontsize=12, color="lightgrey")
-    plt.ylabel("MMR (Integer Rating)", fontsize=12, color="lightgrey")
-
-    ax.xaxis.set_major_formatter(mdates.DateFormatter("%b %d"))
-    plt.xticks(rotation=45)
-    plt.legend(
-        loc="best",
-        facecolor="#2b2d31",
-        edgecolor="#1e1f22",
-        labelcolor="lightgrey",
-    )
+    async with _GRAPH_LOCK:
+        png_bytes = await asyncio.to_thread(_render_graphall, players)
 
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png", bbox_inches="tight")
-    buf.seek(0)
-    plt.close()
-
-    file = discord.File(buf, filename="race.png")
+    file = discord.File(io.BytesIO(png_bytes), filename="race.png")
     embed = discord.Embed(
         title="📈 MMR Graph",
         description="Showing final MMR at the end of each play session.",
@@ -1279,55 +1579,54 @@ async def graphall(interaction: discord.Interaction):
 async def history(
     interaction: discord.Interaction, member: discord.Member | None = None
 ):
+    await interaction.response.defer()
     member = member or interaction.user
 
     data = load_data()
     pid = str(member.id)
 
     if pid not in data or "history" not in data[pid] or len(data[pid]["history"]) == 0:
-        await interaction.response.send_message(
-            f"❌ **{member.display_name}** hasn't played any matches yet!",
-            ephemeral=True,
+        await _followup_ephemeral(
+            interaction, f"❌ **{member.display_name}** hasn't played any matches yet!"
         )
         return
 
-    history_list = data[pid]["history"]
+    ts, mmr, won = get_history_arrays(pid)
     current_time = int(time.time())
     cutoff_time = current_time - SESSION_GAP_SECONDS
     recent_matches: list[str] = []
 
-    for i, match in enumerate(history_list):
-        if match["timestamp"] >= cutoff_time:
-            current_mmr = int(match["mmr"])
-            prev_mmr = (
-                int(history_list[i - 1]["mmr"])
-                if i > 0
-                else int(model.rating(mu=CUSTOM_MU, sigma=CUSTOM_SIGMA).ordinal())
-            )
-
-            diff = current_mmr - prev_mmr
-            sign = "+" if diff >= 0 else ""
-
-            result_text = (
-                "🟩 **WIN** " if match["result"] == "Win" else "🟥 **LOSS**"
-            )
-            time_tag = f"<t:{match['timestamp']}:R>"
-
-            row = (
-                f"{result_text} | **{sign}{diff}** "
-                f"*(Total: {current_mmr})* •  {time_tag}"
-            )
-            recent_matches.append(row)
+    # Timestamps are in match order, so the session is everything from start on
+    start = int(np.searchsorted(ts, cutoff_time, side="left"))
+    prev_mmr = int(mmr[start - 1]) if start > 0 else BASELINE_ORDINAL
+    session_mmr = mmr[start:]
+    diffs = np.diff(session_mmr, prepend=prev_mmr)
+
+    # Newest first
+    for timestamp, current_mmr, diff, is_win in zip(
+        ts[start:][::-1].tolist(),
+        session_mmr[::-1].tolist(),
+        diffs[::-1].tolist(),
+        won[start:][::-1].tolist(),
+    ):
+        sign = "+" if diff >= 0 else ""
+
+        result_text = "🟩 **WIN** " if is_win else "🟥 **LOSS**"
+        time_tag = f"<t:{timestamp}:R>"
+
+        row = (
+            f"{result_text} | **{sign}{diff}** "
+            f"*(Total: {current_mmr})* •  {time_tag}"
+        )
+        recent_matches.append(row)
 
     if not recent_matches:
-        await interaction.response.send_message(
+        await _followup_ephemeral(
+            interaction,
             f"🕰️ **{member.display_name}** hasn't played any matches in the current session.",  # noqa: E501
-            ephemeral=True,
         )
         return
 
-    recent_matches.reverse()
-
     if len(recent_matches) > 15:
         display_text = (
             "\n".join(recent_matches[:15])
@@ -1348,7 +1647,7 @@ async def history(
 
     embed.set_footer(text=f"Total matches this session: {len(recent_matches)}")
 
-    await interaction.response.send_message(embed=embed)
+    await interaction.followup.send(embed=embed)
 
 
 @bot.tree.command(
@@ -1356,11 +1655,14 @@ async def history(
     description="⏪ Revert the last match and restore everyone's MMR.",
 )
 async def undo(interaction: discord.Interaction):
-    restored = restore_backup()
+    await interaction.response.defer()
+
+    async with _DB_LOCK:
+        restored = await asyncio.to_thread(restore_backup)
     if not restored:
-        await interaction.response.send_message(
+        await _followup_ephemeral(
+            interaction,
             "❌ There is no previous match to undo, or a backup hasn't been created yet!",  # noqa: E501
-            ephemeral=True,
         )
         return
 
@@ -1376,7 +1678,7 @@ async def undo(interaction: discord.Interaction):
     embed.set_footer(
         text="You will need to run /match again to re-host the lobby."
     )
-    await interaction.response.send_message(embed=embed)
+    await interaction.followup.send(embed=embed)
 
 
 @bot.tree.command(
@@ -1385,22 +1687,23 @@ async def undo(interaction: discord.Interaction):
 async def dm(
     interaction: discord.Interaction, member: discord.Member, message: str
 ):
-    if interaction.user.id != MY_DISCORD_ID:
+    if interaction.user.id not in OWNER_IDS:
         await interaction.response.send_message(
             "❌ You do not have permission to use this.", ephemeral=True
         )
         return
+    await interaction.response.defer(ephemeral=True)
 
     try:
         await member.send(message)
         print(f"📤 [Sent to {member.display_name}]: {message}")
 
-        await interaction.response.send_message(
+        await interaction.followup.send(
             f"✅ Message secretly delivered to {member.display_name}.",
             ephemeral=True,
         )
     except discord.Forbidden:
-        await interaction.response.send_message(
+        await interaction.followup.send(
             f"❌ Cannot send message to {member.display_name}. DMs are closed!",
             ephemeral=True,
         )
@@ -1460,10 +1763,8 @@ async def help_command(interaction: discord.Interaction):
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
-if not TOKEN:
-    raise RuntimeError(
-        "DISCORD_TOKEN is not set. Make sure it is present in your .env file."
-    )
-
+# Check settings (and resolve BOT_PROFILE) before connecting: errors raised in
+# on_ready are only logged by discord.py, so a bad value must fail here
+validate_config()
 bot.run(TOKEN)
 
@@ -1,20 +1,28 @@
+import errno
+import hashlib
 import json
 import os
 import shutil
 import time
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List
 
+import numpy as np
 from openskill.models import PlackettLuce
 
+try:
+    import orjson
+except ImportError:  # optional speedup; the stdlib json fallback reads/writes the same files
+    orjson = None
+
 from config import (
     CUSTOM_MU,
     CUSTOM_SIGMA,
     CUSTOM_BETA,
     CUSTOM_TAU,
-    DATA_FILE,
-    BACKUP_DATA_FILE,
-    TEST_DATA_FILE,
-    TEST_BACKUP_DATA_FILE,
+    HISTORY_LOG_COMPACT_EVERY,
+    JOURNAL_SNAPSHOT_EVERY,
+    OBSERVERS_FILE,
+    data_files,
 )
 
 
@@ -36,31 +44,311 @@ model = PlackettLuce(
     tau=CUSTOM_TAU,
 )
 
+# Integer ladder rating of a player who hasn't played yet
+BASELINE_ORDINAL = int(model.rating(mu=CUSTOM_MU, sigma=CUSTOM_SIGMA).ordinal())
+
+
+# --- JSON encoding -------------------------------------------------------------
+
+def _json_loads(raw: bytes) -> Any:
+    """Internal helper: decode one JSON document (orjson when available)."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _json_dumps(obj: Any, indent: bool = False) -> bytes:
+    """Internal helper: encode obj as UTF-8 JSON, 2-space indented if indent is set."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, indent=2 if indent else None).encode("utf-8")
+
 
 # --- In-memory cache for player data -----------------------------------------
 
 _data_cache: Dict[str, Any] | None = None
 
+# Parsed JSON (with its history log applied) for files read by path, keyed by
+# absolute path and reused until _disk_stamp() of the file changes.
+_json_cache: Dict[str, tuple[tuple, Dict[str, Any]]] = {}
+
+# Lines in each data file's history log, keyed like _json_cache
+_history_log_lines: Dict[str, int] = {}
+
+# Digest of each data file as last read or written (None while it doesn't
+# exist), keyed like _json_cache. A history log's header names the digest of
+# the file it extends, so a log that outlived a compaction is recognised.
+_data_digests: Dict[str, str | None] = {}
+
+# Ids of players with at least one match, per data file (keyed like
+# _json_cache); a dict so iteration follows the database's own order
+_active_pids: Dict[str, Dict[str, None]] = {}
+
+# Column arrays of each player's history, built on first use per pid by
+# get_history_arrays(). Keyed like _json_cache; the data dict they were built
+# from is kept alongside so a reloaded or restored database starts afresh.
+_history_arrays: Dict[str, tuple[Dict[str, Any], Dict[str, tuple]]] = {}
+
+
+def _is_main_file(data_file: str | None) -> bool:
+    """Internal helper: True when data_file refers to the cached primary database."""
+    return data_file is None or data_file == data_files(False)[0]
+
+
+def _backup_path(data_file: str) -> str:
+    """Internal helper: return the /undo backup path paired with data_file."""
+    for test_mode in (False, True):
+        primary, backup = data_files(test_mode)
+        if data_file == primary:
+            return backup
+    return data_file + ".backup"
+
+
+def _read_jsonl(path: str) -> List[Any] | None:
+    """
+    Internal helper: parse a JSON-lines file written by plain appends, or
+    return None if it doesn't exist.
+
+    A crash mid-append can leave a partial last line; it is cut off the file
+    (so the next append starts on a clean line) instead of failing every later
+    read. A bad line anywhere else still raises.
+    """
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return None
+    body, sep, tail = raw.rpartition(b"\n")
+    rows = [_json_loads(line) for line in body.split(b"\n") if line.strip()]
+    if tail.strip():
+        try:
+            rows.append(_json_loads(tail))
+        except ValueError:
+            with open(path, "r+b") as f:
+                f.truncate(len(body) + len(sep))
+        else:
+            # Complete row that only lost its newline
+            with open(path, "ab") as f:
+                f.write(b"\n")
+    return rows
+
+
+def _journal_path(data_file: str) -> str:
+    """Internal helper: return the match journal path paired with data_file."""
+    return os.path.splitext(data_file)[0] + "_journal.jsonl"
+
+
+def _read_journal(path: str) -> List[Dict[str, Any]] | None:
+    """
+    Internal helper: return the journaled matches, or None if there is no
+    journal. A torn last entry is dropped (see _read_jsonl()).
+    """
+    return _read_jsonl(path)
+
+
+def _history_log_path(data_file: str) -> str:
+    """Internal helper: return the per-player history log path paired with data_file."""
+    return os.path.splitext(data_file)[0] + "_history.jsonl"
+
+
+def _file_digest(raw: bytes) -> str:
+    """Internal helper: short content digest of a data file's bytes."""
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _apply_history_log(data: Dict[str, Any], log_path: str, base: str | None) -> int:
+    """
+    Internal helper: replay a history log onto data in place.
+
+    base is the digest of the data file data was read from. A log whose
+    header names another digest was started against an older data file and
+    outlived its compaction (the delete failed, or the process died right
+    after the data file was written), so it is skipped rather than adding
+    the same matches twice. A torn last line is dropped (see _read_jsonl()).
+    Returns the number of matches replayed (0 if there is no current log).
+    """
+    rows = _read_jsonl(log_path)
+    if not rows:
+        return 0
+    if "base" in rows[0]:
+        if rows[0]["base"] != base:
+            return 0
+        rows = rows[1:]
+    for row in rows:
+        p_data = data.setdefault(row["pid"], _new_player())
+        p_data["mu"] = row["mu"]
+        p_data["sigma"] = row["sigma"]
+        _append_result(
+            p_data,
+            {"timestamp": row["ts"], "mmr": row["mmr"], "result": row["result"]},
+        )
+    return len(rows)
+
+
+def _migrate_mmr_ints(data: Dict[str, Any]) -> None:
+    """
+    Internal helper: turn any float MMR left by old versions into the int the
+    bot has always shown, so readers can use stored values as-is.
+    """
+    for p_data in data.values():
+        for entry in p_data.get("history", ()):
+            if type(entry["mmr"]) is not int:
+                entry["mmr"] = int(entry["mmr"])
+        if "current_mmr" in p_data and type(p_data["current_mmr"]) is not int:
+            p_data["current_mmr"] = int(p_data["current_mmr"])
+
+
+def _disk_stamp(file_path: str) -> tuple:
+    """Internal helper: ((mtime_ns, size) or None, log size or None) for a data file."""
+    try:
+        st = os.stat(file_path)
+        main = (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        main = None
+    try:
+        log = os.stat(_history_log_path(file_path)).st_size
+    except FileNotFoundError:
+        log = None
+    return main, log
+
 
 def _read_from_disk(path: str | None = None) -> Dict[str, Any]:
-    """Internal helper: read the JSON database from disk or return an empty dict."""
-    file_path = path or DATA_FILE
-    if not os.path.exists(file_path):
-        return {}
-    with open(file_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    """
+    Internal helper: read the JSON database plus its history log from disk.
+
+    Returns an empty dict when neither exists. Unchanged files (same mtime,
+    size and log size) are served from _json_cache without re-parsing.
+    """
+    file_path = os.path.abspath(path or data_files(False)[0])
+    stamp = _disk_stamp(file_path)
+    cached = _json_cache.get(file_path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    if stamp[0] is not None:
+        with open(file_path, "rb") as f:
+            raw = f.read()
+        data = _json_loads(raw)
+        _migrate_mmr_ints(data)
+        _data_digests[file_path] = _file_digest(raw)
+    else:
+        data = {}
+        _data_digests[file_path] = None
+    _history_log_lines[file_path] = _apply_history_log(
+        data, _history_log_path(file_path), _data_digests[file_path]
+    )
+    _index_active(file_path, data)
+    _json_cache[file_path] = (_disk_stamp(file_path), data)
+    return data
+
+
+def _index_active(file_path: str, data: Dict[str, Any]) -> None:
+    """Internal helper: rebuild the active-player index for a freshly loaded or written file."""
+    _active_pids[file_path] = dict.fromkeys(
+        pid for pid, p_data in data.items() if p_data.get("history")
+    )
+
+
+def _remember_written(path: str, data: Dict[str, Any]) -> None:
+    """Internal helper: cache data as the parsed form of the files just written for path."""
+    file_path = os.path.abspath(path)
+    _json_cache[file_path] = (_disk_stamp(file_path), data)
+
+
+def _drop_history_log(data_file: str) -> None:
+    """Internal helper: delete data_file's history log once the file itself is current."""
+    file_path = os.path.abspath(data_file)
+    # Reset first: should the delete fail, the next append starts a new log
+    # over the stale one
+    _history_log_lines[file_path] = 0
+    try:
+        os.remove(_history_log_path(file_path))
+    except FileNotFoundError:
+        pass
+
+
+def _write_json_atomic(path: str, data: Dict[str, Any]) -> bytes:
+    """
+    Internal helper: write data as indented JSON to path via a temporary file.
+
+    Returns the bytes written.
+    """
+    raw = _json_dumps(data, indent=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(raw)
+    os.replace(tmp_path, path)
+    return raw
+
+
+def _move_file(src: str, dst: str) -> None:
+    """Internal helper: rename src over dst, copying instead across filesystems."""
+    try:
+        os.replace(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.copy(src, dst)
+        os.remove(src)
+
+
+def _append_history(
+    data: Dict[str, Any], pids: List[int], data_file: str | None = None
+) -> None:
+    """
+    Internal helper: log the latest history entry of each pid instead of
+    rewriting the whole database.
+
+    A new log (replacing any stale one) starts with a header naming the data
+    file's digest. Once the log reaches HISTORY_LOG_COMPACT_EVERY lines it is
+    folded back into the data file by save_data().
+    """
+    data_path = data_files(False)[0] if _is_main_file(data_file) else data_file
+    file_path = os.path.abspath(data_path)
+
+    rows = []
+    mode = "ab"
+    if not _history_log_lines.get(file_path):
+        rows.append(_json_dumps({"base": _data_digests.get(file_path)}) + b"\n")
+        mode = "wb"
+    for pid in pids:
+        p_data = data[str(pid)]
+        last = p_data["history"][-1]
+        rows.append(
+            _json_dumps(
+                {
+                    "pid": str(pid),
+                    "ts": last["timestamp"],
+                    "mmr": last["mmr"],
+                    "mu": p_data["mu"],
+                    "sigma": p_data["sigma"],
+                    "result": last["result"],
+                }
+            )
+            + b"\n"
+        )
+    with open(_history_log_path(file_path), mode) as f:
+        f.write(b"".join(rows))
+    _active_pids.setdefault(file_path, {}).update(dict.fromkeys(str(pid) for pid in pids))
+
+    lines = _history_log_lines.get(file_path, 0) + len(pids)
+    _history_log_lines[file_path] = lines
+    if lines >= HISTORY_LOG_COMPACT_EVERY:
+        save_data(data, data_file=data_file)
+    else:
+        _remember_written(file_path, data)
 
 
 def load_data(data_file: str | None = None) -> Dict[str, Any]:
     """
     Load the player rating database into memory.
 
-    If data_file is None, subsequent calls are served from an in-memory cache.
-    If data_file is set (e.g. TEST_DATA_FILE), reads from that path and returns
+    If data_file is None (or the live data file), subsequent calls are served
+    from an in-memory cache. If data_file is another path (e.g. TEST_DATA_FILE),
+    reads from that path (re-parsing only when its mtime or size changes)
     without using or updating the main cache.
     """
     global _data_cache
-    if data_file is not None:
+    if not _is_main_file(data_file):
         return _read_from_disk(data_file)
     if _data_cache is None:
         _data_cache = _read_from_disk()
@@ -72,88 +360,257 @@ def save_data(data: Dict[str, Any] | None = None, data_file: str | None = None)
     Persist the player rating database to disk.
 
     If data_file is set, writes to that path (data must be provided).
-    Otherwise uses the main cache and DATA_FILE; if data is provided it becomes
-    the new cache. Writes are done atomically via a temporary file.
+    Otherwise uses the main cache and the live data file; if data is provided it
+    becomes the new cache. Writes are done atomically via a temporary file, and
+    the file's history log is dropped since the write already includes it.
     """
     global _data_cache
 
-    if data_file is not None:
+    if not _is_main_file(data_file):
         if data is None:
             data = {}
-        tmp_path = data_file + ".tmp"
-        with open(tmp_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4)
-        os.replace(tmp_path, data_file)
+        raw = _write_json_atomic(data_file, data)
+        _data_digests[os.path.abspath(data_file)] = _file_digest(raw)
+        _drop_history_log(data_file)
+        _remember_written(data_file, data)
+        _index_active(os.path.abspath(data_file), data)
         return
 
     if data is not None:
         _data_cache = data
     if _data_cache is None:
         _data_cache = {}
-    tmp_path = DATA_FILE + ".tmp"
-    with open(tmp_path, "w", encoding="utf-8") as f:
-        json.dump(_data_cache, f, indent=4)
-    os.replace(tmp_path, DATA_FILE)
+    data_path, _ = data_files(False)
+    raw = _write_json_atomic(data_path, _data_cache)
+    _data_digests[os.path.abspath(data_path)] = _file_digest(raw)
+    _drop_history_log(data_path)
+    _remember_written(data_path, _data_cache)
+    _index_active(os.path.abspath(data_path), _data_cache)
 
 
 def backup_data(data_file: str | None = None) -> None:
     """
-    Create a backup of the current database for /undo.
-
-    If data_file is set, backs up that file to its corresponding backup path
-    (TEST_BACKUP_DATA_FILE when data_file is TEST_DATA_FILE).
+    Snapshot the current database to its backup path.
+
+    The snapshot is the base that restore_backup() replays the match journal
+    onto. If data_file is set, backs up that file to its corresponding backup
+    path (TEST_BACKUP_DATA_FILE when data_file is TEST_DATA_FILE). The snapshot
+    is written from the loaded data (history log included), so the data file
+    is never read back or copied. With nothing to back up, any older snapshot
+    is removed so it can't be restored.
     """
-    if data_file is not None:
-        backup_path = TEST_BACKUP_DATA_FILE if data_file == TEST_DATA_FILE else (data_file + ".backup")
-        if not os.path.exists(data_file):
-            return
-        shutil.copy(data_file, backup_path)
+    data_path = data_files(False)[0] if _is_main_file(data_file) else data_file
+    backup_path = _backup_path(data_path)
+    data = load_data(data_file=data_file)
+    if not data and not os.path.exists(data_path):
+        if os.path.exists(backup_path):
+            os.remove(backup_path)
         return
+    _write_json_atomic(backup_path, data)
 
-    data = load_data()
-    if not data and not os.path.exists(DATA_FILE):
-        return
-    if not os.path.exists(DATA_FILE):
-        save_data(data)
-    shutil.copy(DATA_FILE, BACKUP_DATA_FILE)
+
+def journal_match(
+    winners: List[Any],
+    losers: List[Any],
+    match_time: int,
+    data_file: str | None = None,
+) -> None:
+    """
+    Record a match in the undo journal; call this before update_ratings().
+
+    Usually a one-line append. On first use, and once the journal holds
+    JOURNAL_SNAPSHOT_EVERY matches, the database is snapshotted with
+    backup_data() and the journal starts over.
+    """
+    data_path = data_files(False)[0] if _is_main_file(data_file) else data_file
+    journal_path = _journal_path(data_path)
+
+    entries = _read_journal(journal_path)
+    if entries is None or len(entries) >= JOURNAL_SNAPSHOT_EVERY:
+        backup_data(data_file=data_file)
+        open(journal_path, "w", encoding="utf-8").close()
+
+    entry = {
+        "timestamp": match_time,
+        "winners": [p.id for p in winners],
+        "losers": [p.id for p in losers],
+    }
+    with open(journal_path, "ab") as f:
+        f.write(_json_dumps(entry) + b"\n")
 
 
 def restore_backup(data_file: str | None = None) -> bool:
     """
-    Restore the database from the backup created by backup_data().
+    Undo the most recent match recorded by journal_match().
 
-    If data_file is set, restores that file from its backup (e.g. TEST_DATA_FILE).
-    Returns True if a backup was restored, False if no backup was found.
+    The backup snapshot is reloaded and every journaled match except the last
+    is replayed onto it. The result becomes the new snapshot, so /undo only
+    ever reverts a single match. If data_file is set, restores that file
+    instead (e.g. TEST_DATA_FILE). Returns True if a match was undone, False
+    if there was nothing to undo.
     """
     global _data_cache
 
-    if data_file is not None:
-        backup_path = TEST_BACKUP_DATA_FILE if data_file == TEST_DATA_FILE else (data_file + ".backup")
+    data_path = data_files(False)[0] if _is_main_file(data_file) else data_file
+    backup_path = _backup_path(data_path)
+    journal_path = _journal_path(data_path)
+
+    entries = _read_journal(journal_path)
+    if entries is None:
+        # Plain pre-journal backup: it already is the state before the last match
         if not os.path.exists(backup_path):
             return False
-        shutil.copy(backup_path, data_file)
-        os.remove(backup_path)
+        _move_file(backup_path, data_path)
+        _drop_history_log(data_path)
+        if _is_main_file(data_file):
+            _data_cache = None
         return True
-
-    if not os.path.exists(BACKUP_DATA_FILE):
+    if not entries:
         return False
-    shutil.copy(BACKUP_DATA_FILE, DATA_FILE)
-    os.remove(BACKUP_DATA_FILE)
-    _data_cache = None
+
+    try:
+        with open(backup_path, "rb") as f:
+            data = _json_loads(f.read())
+    except FileNotFoundError:
+        data = {}
+    _migrate_mmr_ints(data)
+    for entry in entries[:-1]:
+        _rate_match(data, entry["winners"], entry["losers"], entry["timestamp"])
+
+    save_data(data, data_file=data_file)
+    backup_data(data_file=data_file)
+    open(journal_path, "w", encoding="utf-8").close()
     return True
 
 
+# --- Observers ----------------------------------------------------------------
+
+def load_observers() -> tuple[set[int], float]:
+    """
+    Return (observer ids, last lobby time) as last saved by save_observers(),
+    or (empty set, 0.0) if nothing has been saved yet.
+    """
+    try:
+        with open(OBSERVERS_FILE, "rb") as f:
+            saved = _json_loads(f.read())
+    except FileNotFoundError:
+        return set(), 0.0
+    return set(saved["observers"]), float(saved["last_lobby_time"])
+
+
+def save_observers(observer_ids: Iterable[int], last_lobby_time: float) -> None:
+    """Persist the observer ids and last lobby time, replacing the file atomically."""
+    _write_json_atomic(
+        OBSERVERS_FILE,
+        {"observers": sorted(observer_ids), "last_lobby_time": last_lobby_time},
+    )
+
+
 # --- Rating helpers -----------------------------------------------------------
 
-def get_player_rating(user_id: int, data_file: str | None = None):
+def _new_player() -> Dict[str, Any]:
+    """Internal helper: the database entry for a player's first match."""
+    return {"mu": CUSTOM_MU, "sigma": CUSTOM_SIGMA, "history": [], "wins": 0, "losses": 0}
+
+
+def _append_result(p_data: Dict[str, Any], entry: Dict[str, Any]) -> None:
+    """
+    Internal helper: add a match to a player's history and keep the stored
+    wins / losses / current_mmr counters in step with it.
+    """
+    history = p_data["history"]
+    if "wins" not in p_data:
+        # Entry saved before the counters existed: count its history once
+        wins = sum(1 for m in history if m["result"] == "Win")
+        p_data["wins"] = wins
+        p_data["losses"] = len(history) - wins
+    history.append(entry)
+    p_data["wins" if entry["result"] == "Win" else "losses"] += 1
+    p_data["current_mmr"] = entry["mmr"]
+
+
+def get_player_record(p_data: Dict[str, Any]) -> tuple[int, int, int]:
+    """
+    Return (wins, losses, current_mmr) for a player entry with at least one match.
+
+    Reads the stored counters, falling back to scanning the history for
+    entries that predate them.
+    """
+    history = p_data["history"]
+    if "wins" in p_data and "current_mmr" in p_data:
+        return p_data["wins"], p_data["losses"], p_data["current_mmr"]
+    wins = sum(1 for m in history if m["result"] == "Win")
+    return wins, len(history) - wins, history[-1]["mmr"]
+
+
+def get_active_player_ids(data_file: str | None = None) -> List[str]:
+    """
+    Return the ids (as stored, i.e. str) of players with at least one match,
+    in database order, without scanning every entry.
+    """
+    load_data(data_file=data_file)
+    data_path = data_files(False)[0] if _is_main_file(data_file) else data_file
+    return list(_active_pids.get(os.path.abspath(data_path), ()))
+
+
+def get_history_arrays(
+    user_id: int | str, data_file: str | None = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Return a player's history as parallel (timestamp, mmr, result) arrays.
+
+    Dtypes are int64, int32 and uint8 (1 for a win, 0 for a loss); a player
+    with no matches gets empty arrays. The arrays are cached until the player's
+    next match and must not be modified. A match rated in a worker thread while
+    the arrays were being built can leave them one match short; they are
+    rebuilt whenever their length no longer matches the history.
+    """
+    data = load_data(data_file=data_file)
+    data_path = data_files(False)[0] if _is_main_file(data_file) else data_file
+    file_path = os.path.abspath(data_path)
+
+    cached = _history_arrays.get(file_path)
+    if cached is None or cached[0] is not data:
+        cached = (data, {})
+        _history_arrays[file_path] = cached
+    pid = str(user_id)
+    history = data[pid]["history"] if pid in data else []
+    arrays = cached[1].get(pid)
+    if arrays is None or arrays[0].size != len(history):
+        n = len(history)
+        arrays = (
+            np.fromiter((m["timestamp"] for m in history), dtype=np.int64, count=n),
+            np.fromiter((m["mmr"] for m in history), dtype=np.int32, count=n),
+            np.fromiter((m["result"] == "Win" for m in history), dtype=np.uint8, count=n),
+        )
+        cached[1][pid] = arrays
+    return arrays
+
+
+def _forget_history_arrays(data_file: str | None, pids: Iterable[Any]) -> None:
+    """Internal helper: drop the cached history arrays of players who just played."""
+    data_path = data_files(False)[0] if _is_main_file(data_file) else data_file
+    cached = _history_arrays.get(os.path.abspath(data_path))
+    if cached is not None:
+        for pid in pids:
+            cached[1].pop(str(pid), None)
+
+
+def get_player_rating(
+    user_id: int,
+    data_file: str | None = None,
+    data: Dict[str, Any] | None = None,
+):
     """
     Return an OpenSkill rating object for the given player ID.
 
     If the player has no history, they are initialized with the
     configured CUSTOM_MU and CUSTOM_SIGMA.
     If data_file is set, ratings are read from that file (e.g. test data).
+    If data is given (an already loaded database), it is used as-is.
     """
-    data = load_data(data_file=data_file)
+    if data is None:
+        data = load_data(data_file=data_file)
     pid_str = str(user_id)
 
     if pid_str in data:
@@ -162,39 +619,49 @@ def get_player_rating(user_id: int, data_file: str | None = None):
     return model.rating(mu=CUSTOM_MU, sigma=CUSTOM_SIGMA)
 
 
+def get_player_ratings_bulk(
+    user_ids: Iterable[int],
+    data_file: str | None = None,
+    data: Dict[str, Any] | None = None,
+) -> Dict[int, Any]:
+    """
+    Return {user_id: rating} for several players from a single database load.
+
+    Defaults and data_file / data handling match get_player_rating().
+    """
+    if data is None:
+        data = load_data(data_file=data_file)
+    return {uid: get_player_rating(uid, data=data) for uid in user_ids}
+
+
 def get_player_ordinal(user_id: int, data_file: str | None = None) -> int:
     """Convenience helper: return the integer ladder rating for a player."""
     return int(get_player_rating(user_id, data_file=data_file).ordinal())
 
 
-def update_ratings(
-    winners: List[Any], losers: List[Any], data_file: str | None = None
+def _rate_match(
+    data: Dict[str, Any],
+    winner_ids: List[int],
+    loser_ids: List[int],
+    match_time: int,
 ) -> None:
-    """
-    Apply an OpenSkill update for a single match.
-
-    `winners` and `losers` are expected to be Discord Member-like objects
-    with an `.id` attribute. If data_file is set, read/write that file (e.g. test).
-    """
-    data = load_data(data_file=data_file)
-    match_time = int(time.time())
-
+    """Internal helper: apply one match's OpenSkill update to data in place."""
     # 1. Build Team 1 (Winners)
     team1_ratings = []
-    for p in winners:
-        pid_str = str(p.id)
+    for pid in winner_ids:
+        pid_str = str(pid)
         if pid_str not in data:
-            data[pid_str] = {"mu": CUSTOM_MU, "sigma": CUSTOM_SIGMA, "history": []}
+            data[pid_str] = _new_player()
         team1_ratings.append(
             model.rating(mu=data[pid_str]["mu"], sigma=data[pid_str]["sigma"])
         )
 
     # 2. Build Team 2 (Losers)
     team2_ratings = []
-    for p in losers:
-        pid_str = str(p.id)
+    for pid in loser_ids:
+        pid_str = str(pid)
         if pid_str not in data:
-            data[pid_str] = {"mu": CUSTOM_MU, "sigma": CUSTOM_SIGMA, "history": []}
+            data[pid_str] = _new_player()
         team2_ratings.append(
             model.rating(mu=data[pid_str]["mu"], sigma=data[pid_str]["sigma"])
         )
@@ -205,38 +672,73 @@ def update_ratings(
     updated_losers_team = updated_teams[1]
 
     # 4. Save the Winners
-    for i, p in enumerate(winners):
+    for i, pid in enumerate(winner_ids):
         new_r = updated_winners_team[i]
-        pid_str = str(p.id)
+        pid_str = str(pid)
 
         data[pid_str]["mu"] = new_r.mu
         data[pid_str]["sigma"] = new_r.sigma
 
-        data[pid_str]["history"].append(
-            {"timestamp": match_time, "mmr": int(new_r.ordinal()), "result": "Win"}
+        _append_result(
+            data[pid_str],
+            {"timestamp": match_time, "mmr": int(new_r.ordinal()), "result": "Win"},
         )
 
     # 5. Save the Losers
-    for i, p in enumerate(losers):
+    for i, pid in enumerate(loser_ids):
         new_r = updated_losers_team[i]
-        pid_str = str(p.id)
+        pid_str = str(pid)
 
         data[pid_str]["mu"] = new_r.mu
         data[pid_str]["sigma"] = new_r.sigma
 
-        data[pid_str]["history"].append(
-            {"timestamp": match_time, "mmr": int(new_r.ordinal()), "result": "Loss"}
+        _append_result(
+            data[pid_str],
+            {"timestamp": match_time, "mmr": int(new_r.ordinal()), "result": "Loss"},
         )
 
-    save_data(data, data_file=data_file)
 
+def update_ratings(
+    winners: List[Any],
+    losers: List[Any],
+    data_file: str | None = None,
+    match_time: int | None = None,
+    data: Dict[str, Any] | None = None,
+) -> None:
+    """
+    Apply an OpenSkill update for a single match.
 
-def display_mmr(pid: int, data_file: str | None = None) -> str:
+    `winners` and `losers` are expected to be Discord Member-like objects
+    with an `.id` attribute. If data_file is set, read/write that file (e.g. test).
+    match_time defaults to now; pass the time given to journal_match() so an
+    /undo replay reproduces the same history entries.
+    If data is given (what load_data() just returned for data_file), it is
+    updated in place instead of being looked up again.
+    """
+    if data is None:
+        data = load_data(data_file=data_file)
+    if match_time is None:
+        match_time = int(time.time())
+
+    match_ids = [p.id for p in winners] + [p.id for p in losers]
+    _rate_match(data, [p.id for p in winners], [p.id for p in losers], match_time)
+    _forget_history_arrays(data_file, match_ids)
+
+    # data is the cached dict, so readers already see the update; only the
+    # new history entries need to hit the disk
+    _append_history(data, match_ids, data_file=data_file)
+
+
+def display_mmr(
+    pid: int, data_file: str | None = None, data: Dict[str, Any] | None = None
+) -> str:
     """
     Return the display-ready integer rating string for a player ID.
     If data_file is set, read from that file (e.g. test data).
+    If data is given (an already loaded database), it is used as-is.
     """
-    data = load_data(data_file=data_file)
+    if data is None:
+        data = load_data(data_file=data_file)
     key = str(pid)
 
     if key in data: